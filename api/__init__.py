@@ -1,6 +1,14 @@
 from coordinator import Coordinator
+from accounts import AccountsCoordinator
+from daemon import Daemon
 from eddaclient import EddaClient
 from eddaclient import EddaException
+from diskcache import DiskCache
+from httptransport import HTTPTransport
+from metrics import QueryStats
+from metrics import RunMetrics
+from responsecache import ResponseCache
 from alerter import Alerter
 from instanceenricher import InstanceEnricher
 from instanceenricher import instance_report
+from instanceenricher import ENRICHED_INSTANCE_FIELDS
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import logging
+from collections import MutableMapping
+from multiprocessing.pool import ThreadPool
+
+from coordinator import Coordinator
+from metrics import RunMetrics
+
+# the options of the Alerter, which sends the alerts of every account
+ALERTER_OPTIONS = ('output', 'email_from', 'email_to', 'email_subject', 'smtp_host', 'es_host', 'es_port')
+
+
+def account_config(config, account):
+    """
+    The configuration of an account: the top-level options overridden by the ones of the account. The alerter
+    options can't be overridden, they are dropped.
+    """
+    merged = {key: value for key, value in config.iteritems() if key != 'accounts'}
+    for key, value in config['accounts'][account].iteritems():
+        if key in ALERTER_OPTIONS:
+            logging.getLogger("AccountsCoordinator").warning("The %s option of account %s is ignored, the alerts of "
+                                                             "every account are sent with the top-level one",
+                                                             key, account)
+        elif key.startswith('plugin.') and isinstance(merged.get(key), dict):
+            merged[key] = dict(merged[key], **value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class AccountStatus(MutableMapping):
+    """The part of the status belonging to an account: its keys are prefixed with account.<name>."""
+
+    def __init__(self, status, account):
+        self.status = status
+        self.prefix = 'account.%s.' % account
+
+    def __getitem__(self, key):
+        return self.status[self.prefix + key]
+
+    def __setitem__(self, key, value):
+        self.status[self.prefix + key] = value
+
+    def __delitem__(self, key):
+        del self.status[self.prefix + key]
+
+    def __contains__(self, key):
+        return self.prefix + key in self.status
+
+    def __iter__(self):
+        return iter([key[len(self.prefix):] for key in self.status.keys() if key.startswith(self.prefix)])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def setdefault(self, key, default=None):
+        # returns the stored value, which is not the default with the SQLite status store
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def commit(self, key):
+        if hasattr(self.status, 'commit'):
+            self.status.commit(self.prefix + key)
+
+
+class AccountsCoordinator:
+    """
+    Runs the plugins for several AWS accounts, each with its own EDDA, config and status. The EDDA data of all
+    accounts is fetched concurrently, then the plugins run account by account, each account with new instances of
+    the plugins. The alerts are tagged with the account.
+    """
+
+    def __init__(self, accounts, alerter, config, status, profiler=None):
+        self.logger = logging.getLogger("AccountsCoordinator")
+        # accounts: (name, edda_client) pairs
+        self.coordinators = [(name, Coordinator(edda_client, alerter, account_config(config, name),
+                                                AccountStatus(status, name), account=name, profiler=profiler))
+                             for name, edda_client in accounts]
+        self.metrics = RunMetrics()
+
+    def prefetch(self, plugins, pool_size=8):
+        self.logger.info("prefetching the EDDA data of %d accounts", len(self.coordinators))
+        pool = ThreadPool(len(self.coordinators))
+        try:
+            pool.map(lambda account: account[1].prefetch(plugins, pool_size), self.coordinators)
+        finally:
+            pool.close()
+
+    def run_all(self, plugins, jobs=1):
+        for name, coordinator in self.coordinators:
+            self.logger.info("running the plugins of account %s", name)
+            try:
+                # the plugins keep the options of their previous init which are not in the config of this account
+                coordinator.run_all([plugin.__class__() for plugin in plugins], jobs)
+            except Exception:
+                # the other accounts are still checked
+                self.logger.exception("Failed to run the plugins of account %s", name)
+            for plugin_name, metrics in coordinator.metrics.plugins.iteritems():
+                self.metrics.plugins['%s.%s' % (name, plugin_name)] = metrics
+
+    def log_cache_stats(self):
+        self.coordinators[0][1].log_cache_stats()
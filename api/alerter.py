@@ -4,11 +4,10 @@ import hashlib
 import logging
 import smtplib
 import sys
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
-from elasticsearch import Elasticsearch
-
 
 class StdOutAlertSender:
     def __init__(self, tabsep, console=sys.stdout):
@@ -17,18 +16,19 @@ class StdOutAlertSender:
 
     def send_alerts(self, configuration, alerts):
         for alert in alerts:
-            self.console.write(self.format_alert(alert[0], alert[1], alert[2]))
+            self.console.write(self.format_alert(*alert))
             self.console.write("\n")
 
-    def format_alert(self, plugin_name, checked_id, details):
+    def format_alert(self, plugin_name, checked_id, details, account=None):
         if self.tab_separated_output:
-            return ("%s\t%s\t%s\n" %
-                    (plugin_name, checked_id, repr(details)))
+            return ("%s\t%s\t%s%s\n" %
+                    (plugin_name, checked_id, repr(details), "\t" + account if account else ""))
         else:
-            return ("Rule: %s\n"
+            return ("%s"
+                    "Rule: %s\n"
                     "Subject: %s\n"
                     "Alert: %s\n\n" %
-                    (plugin_name, checked_id, details))
+                    ("Account: %s\n" % account if account else "", plugin_name, checked_id, details))
 
 
 class EmailAlertSender:
@@ -71,6 +71,8 @@ class ESAlertSender:
         self.logger = logging.getLogger("ESAlertSender")
 
     def send_alerts(self, configuration, alerts):
+        # imported here, as it is only needed if the elasticsearch output is enabled
+        from elasticsearch import Elasticsearch
         self.es = Elasticsearch([{"host": configuration["es_host"], "port": configuration["es_port"]}])
         for alert in self.flatten_alerts(alerts):
             self.insert_es(alert)
@@ -89,32 +91,41 @@ class ESAlertSender:
             if isinstance(details, dict):
                 base = {"rule": alert[0], "id": alert[1]}
                 base.update(details)
-                yield base
             else:
-                yield {"rule": alert[0], "id": alert[1], "details": details}
+                base = {"rule": alert[0], "id": alert[1], "details": details}
+            if len(alert) > 3 and not base.get("awsAccount"):
+                # the account id found by the plugin is more specific than the name of the account, but
+                # instance reports have no account id for the instances without instance profile
+                base["awsAccount"] = alert[3]
+            yield base
 
 
 class Alerter:
+    # senders are created only if they are enabled
     AVAILABLE_ALERTERS = {
-        "stdout": StdOutAlertSender(tabsep=False),
-        "stdout_tabsep": StdOutAlertSender(tabsep=True),
-        "mail_txt": EmailAlertSender(msg_type='plain'),
-        "mail_html": EmailAlertSender(msg_type='text/html'),
-        "elasticsearch": ESAlertSender()
+        "stdout": lambda: StdOutAlertSender(tabsep=False),
+        "stdout_tabsep": lambda: StdOutAlertSender(tabsep=True),
+        "mail_txt": lambda: EmailAlertSender(msg_type='plain'),
+        "mail_html": lambda: EmailAlertSender(msg_type='text/html'),
+        "elasticsearch": lambda: ESAlertSender()
     }
 
     def __init__(self, enabled_alert_formats):
         formats = enabled_alert_formats.split(',')
-        self.enabled_alerters = [self.AVAILABLE_ALERTERS[a] for a in formats if a in self.AVAILABLE_ALERTERS]
+        self.enabled_alerters = [self.AVAILABLE_ALERTERS[a]() for a in formats if a in self.AVAILABLE_ALERTERS]
         self.recorded_alerts = []
+        self.lock = threading.Lock()
 
     def send_alerts(self, configuration={}):
         if self.recorded_alerts:
             for alerter in self.enabled_alerters:
                 alerter.send_alerts(configuration, self.recorded_alerts)
 
-    def run(self, alert_obj):
-        # don't store duplicate alerts
-        alerts_obj = {a['id']: (a['plugin_name'], a['id'], d) for a in alert_obj for d in a['details']}
+    def run(self, alert_obj, account=None):
+        # don't store duplicate alerts, tag them with the account if there are several
+        account_tag = (account,) if account else ()
+        alerts_obj = {a['id']: (a['plugin_name'], a['id'], d) + account_tag for a in alert_obj for d in a['details']}
 
-        self.recorded_alerts.extend(alerts_obj.values())
+        # plugins may run on parallel threads
+        with self.lock:
+            self.recorded_alerts.extend(alerts_obj.values())
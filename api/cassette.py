@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+import gzip
+import hashlib
+import importlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def encode_body(body):
+    # byte strings survive the JSON round trip as latin-1
+    return body.decode('latin-1')
+
+
+def decode_body(body):
+    return body.encode('latin-1')
+
+
+def serializable(value):
+    try:
+        json.dumps(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+def encode_error(error):
+    """The class, the args and the JSON serializable attributes of an exception, to raise it in replay mode."""
+    return {'class': '%s.%s' % (error.__class__.__module__, error.__class__.__name__),
+            'args': [arg if serializable(arg) else repr(arg) for arg in error.args],
+            'attributes': {name: value for name, value in vars(error).iteritems() if serializable(value)}}
+
+
+def decode_error(recorded):
+    module_name, class_name = recorded['class'].rsplit('.', 1)
+    error_class = getattr(importlib.import_module(module_name), class_name)
+    # the constructor is not called, its arguments may differ from args (eg. urllib2.HTTPError has no args)
+    error = error_class.__new__(error_class)
+    error.args = tuple(recorded['args'])
+    error.__dict__.update(recorded['attributes'])
+    return error
+
+
+class Cassette:
+    """
+    Records the responses of external services into a directory, one gzipped JSON file per request, and serves
+    them back in replay mode with the latency they had when recorded (multiplied by latency_scale). The errors
+    are recorded too, and raised again in replay mode.
+    """
+
+    def __init__(self, directory, replay=False, latency_scale=1.0):
+        self.logger = logging.getLogger("Cassette")
+        self.directory = directory
+        self.replaying = replay
+        self.latency_scale = latency_scale
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def _path(self, kind, key):
+        return os.path.join(self.directory, '%s-%s.json.gz' % (kind, hashlib.sha1(key).hexdigest()))
+
+    def call(self, kind, key, func):
+        if self.replaying:
+            return self.replay(kind, key)
+        return self.record(kind, key, func)
+
+    def record(self, kind, key, func):
+        start = time.time()
+        try:
+            response = func()
+        except Exception as e:
+            self.save(kind, key, {'kind': kind, 'key': key, 'latency': time.time() - start, 'error': encode_error(e)})
+            raise
+        self.save(kind, key, {'kind': kind, 'key': key, 'latency': time.time() - start, 'response': response})
+        return response
+
+    def replay(self, kind, key):
+        try:
+            with gzip.open(self._path(kind, key), 'rb') as cassette_file:
+                interaction = json.load(cassette_file)
+        except IOError:
+            raise CassetteMiss('No recorded %s response for %s' % (kind, key))
+        if self.latency_scale:
+            time.sleep(interaction['latency'] * self.latency_scale)
+        if 'error' in interaction:
+            raise decode_error(interaction['error'])
+        return interaction['response']
+
+    def save(self, kind, key, interaction):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        with gzip.open(tmp_path, 'wb') as cassette_file:
+            json.dump(interaction, cassette_file)
+        os.rename(tmp_path, self._path(kind, key))
+
+    def save_meta(self, meta):
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as meta_file:
+            json.dump(meta, meta_file, indent=4)
+
+    def load_meta(self):
+        with open(os.path.join(self.directory, 'meta.json'), 'r') as meta_file:
+            return json.load(meta_file)
+
+
+class CassetteTransport:
+    """Records or replays the EDDA responses of the wrapped HTTPTransport."""
+
+    def __init__(self, transport, cassette):
+        self.transport = transport
+        self.cassette = cassette
+
+    def iter_content(self, url, chunk_size, timeout=None):
+        content = decode_body(self.cassette.call(
+            'edda', url, lambda: encode_body(''.join(self.transport.iter_content(url, chunk_size, timeout)))))
+        for start in xrange(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def read(self, url, timeout=None):
+        def read():
+            code, content = self.transport.read(url, timeout)
+            return [code, encode_body(content)]
+        code, content = self.cassette.call('edda_raw', url, read)
+        return code, decode_body(content)
+
+
+class CassetteHTTPResponse:
+    """The parts of httplib.HTTPResponse used by boto."""
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def read(self, amt=None):
+        return self.body
+
+    def getheader(self, name, default=None):
+        for header, value in self.headers:
+            if header.lower() == name.lower():
+                return value
+        return default
+
+    def getheaders(self):
+        return self.headers
+
+
+_install_lock = threading.Lock()
+
+
+def install(cassette):
+    """
+    Hooks the cassette into the clients of the external services used by the plugins: Chef (pychef's ChefAPI),
+    AWS (boto's connections, eg. S3) and the web sites fetched by the route53 and sso plugins. Randomness is
+    seeded, so the plugins sampling data (s3acl) make the same requests in replay mode.
+    """
+    import boto.connection
+    import chef
+    import plugins.route53
+    import plugins.sso
+    from requests.structures import CaseInsensitiveDict
+
+    with _install_lock:
+        random.seed(0)
+
+        chef_request = chef.ChefAPI.request
+
+        def request(self, method, path, headers={}, data=None):
+            return cassette.call('chef', '%s %s %s' % (method, path, data or ''),
+                                 lambda: chef_request(self, method, path, headers, data))
+        chef.ChefAPI.request = request
+        if cassette.replaying:
+            # the client key is not needed to replay
+            chef.ChefAPI.__init__ = lambda self, url, key, client, *args, **kwargs: None
+
+        make_request = boto.connection.AWSAuthConnection.make_request
+
+        def aws_request(self, method, path, headers=None, data='', host=None, *args, **kwargs):
+            def record():
+                response = make_request(self, method, path, headers, data, host, *args, **kwargs)
+                return [response.status, response.reason, response.getheaders(), encode_body(response.read())]
+            status, reason, response_headers, body = cassette.call(
+                'aws', '%s %s %s' % (method, host or self.host, path), record)
+            return CassetteHTTPResponse(status, reason, [tuple(header) for header in response_headers],
+                                        decode_body(body))
+        boto.connection.AWSAuthConnection.make_request = aws_request
+
+        fetch_url = plugins.sso.fetch_url
+
+        def cassette_fetch_url(location):
+            def record():
+                location_fetched, response = fetch_url(location)
+                if response:
+                    response = {'code': response['code'],
+                                'headers': {k.lower(): v for k, v in response['headers'].iteritems()}}
+                return response
+            response = cassette.call('http', location, record)
+            if response:
+                response['headers'] = CaseInsensitiveDict(response['headers'])
+            return location, response
+        plugins.sso.fetch_url = cassette_fetch_url
+
+        page_process = plugins.route53.page_process_for_route53changed
+
+        def cassette_page_process(location):
+            return tuple(cassette.call('page', location, lambda: list(page_process(location))))
+        plugins.route53.page_process_for_route53changed = cassette_page_process
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+from netaddr import IPNetwork
+
+
+class CIDRMatcher:
+    """
+    Tells whether an IP range is contained by any of a list of networks (IPv4 and IPv6). The networks are
+    compiled into the levels of a binary prefix trie: for every prefix length, the set of network prefixes
+    of that length. A lookup tests the prefixes of the range at the lengths present, so it takes at most
+    as many set lookups as the prefix length, whatever the number of networks. Verdicts are memoized by
+    range string.
+    """
+
+    def __init__(self, networks):
+        self.networks = networks
+        self._levels = {}
+        for network in networks:
+            levels = self._levels.setdefault(network.version, {})
+            levels.setdefault(network.prefixlen, set()).add(network.first >> self._host_bits(network))
+        # longest prefixes first: they are the most specific, checked against the most entries
+        self._lengths = {version: sorted(levels, reverse=True) for version, levels in self._levels.iteritems()}
+        self._verdicts = {}
+
+    @staticmethod
+    def _host_bits(network):
+        return (32 if network.version == 4 else 128) - network.prefixlen
+
+    def __contains__(self, ip_range):
+        if ip_range not in self._verdicts:
+            # raises AddrFormatError if ip_range is not valid, like IPNetwork
+            self._verdicts[ip_range] = self.contains_network(IPNetwork(ip_range))
+        return self._verdicts[ip_range]
+
+    def contains_network(self, network):
+        levels = self._levels.get(network.version, {})
+        bits = 32 if network.version == 4 else 128
+        for length in self._lengths.get(network.version, []):
+            if length <= network.prefixlen and network.first >> (bits - length) in levels[length]:
+                return True
+        return False
@@ -1,27 +1,217 @@
+import copy
 import inspect
+import logging
+import sys
+import threading
+import time
+from multiprocessing.pool import ThreadPool
 
 from instanceenricher import InstanceEnricher
+from metrics import QueryStats, RunMetrics
+from profiler import NullProfiler
+
+# worker threads of the plugins which overran their deadlines and are still running, by plugin name
+overrunning_workers = {}
+
 
 class Coordinator:
 
-    def __init__(self, edda_client, alerter, config, status):
+    def __init__(self, edda_client, alerter, config, status, instance_enricher=None, account=None, profiler=None):
+        self.logger = logging.getLogger("Coordinator")
+        self.account = account
+        self.profiler = profiler or NullProfiler()
         self.edda_client = edda_client
         self.alerter = alerter
         self.status = status
         self.config = config
+        # a long-running process may share the enricher between runs, it is refreshed when initialized
+        self.instance_enricher = instance_enricher or InstanceEnricher(self.edda_client)
+        self.enricher_initialized = False
+        self.metrics = RunMetrics()
+
+    def initialize_enricher(self):
+        if not self.enricher_initialized:
+            self.instance_enricher.initialize_caches()
+            self.enricher_initialized = True
+
+    def edda_projections(self, plugins):
+        # a collection is projected only if every plugin (and the enricher) querying it declared the fields it uses
+        if not all(hasattr(plugin, 'edda_queries') for plugin in plugins):
+            return {}
+        requesters = [(self.instance_enricher.edda_queries(), self.instance_enricher.edda_fields())]
+        for plugin in plugins:
+            plugin_config = self.plugin_specific(plugin.plugin_name, self.config)
+            plugin_fields = plugin.edda_fields(plugin_config) if hasattr(plugin, 'edda_fields') else {}
+            requesters.append((plugin.edda_queries(self.edda_client, plugin_config), plugin_fields))
+
+        fields = {}
+        for queries, requested_fields in requesters:
+            for edda_client, uri in queries:
+                if uri in requested_fields and fields.get(uri, set()) is not None:
+                    fields[uri] = fields.get(uri, set()) | set(requested_fields[uri])
+                else:
+                    fields[uri] = None
+        return {uri: sorted(f) for uri, f in fields.iteritems() if f}
+
+    def apply_projections(self, plugins):
+        projections = self.edda_projections(plugins)
+        self.logger.info("EDDA field projections: %s", projections)
+        self.edda_client = self.edda_client.with_projections(projections)
         self.instance_enricher = InstanceEnricher(self.edda_client)
-        self.instance_enricher.initialize_caches()
+        self.enricher_initialized = False
+
+    def prefetch(self, plugins, pool_size=8):
+        if self.config.get('edda_field_projection'):
+            self.apply_projections(plugins)
+
+        # collect the EDDA queries of every plugin, so they can be fetched in parallel into the shared cache
+        queries = {}
+        query_lists = [self.instance_enricher.edda_queries()]
+        for plugin in plugins:
+            if hasattr(plugin, 'edda_queries'):
+                plugin_config = self.plugin_specific(plugin.plugin_name, self.config)
+                query_lists.append(plugin.edda_queries(self.edda_client, plugin_config))
+        for edda_client, uri in sum(query_lists, []):
+            queries.setdefault(edda_client._construct_uri(uri), (edda_client, uri))
+
+        self.logger.info("prefetching %d EDDA queries on %d threads", len(queries), pool_size)
+        pool = ThreadPool(max(1, min(pool_size, len(queries))))
+        try:
+            pool.map(self._prefetch_query, queries.values())
+        finally:
+            pool.close()
+        self.initialize_enricher()
+
+    def _prefetch_query(self, query):
+        edda_client, uri = query
+        try:
+            edda_client.query(uri)
+        except Exception:
+            # the plugin will run the query again and handle the error on its own
+            self.logger.exception("Failed to prefetch '%s'", uri)
+
+    def log_cache_stats(self):
+        if hasattr(self.edda_client._cache, 'stats'):
+            self.logger.info("EDDA cache stats: %s", self.edda_client._cache.stats())
+
+    def run_all(self, plugins, jobs=1):
+        # create the config and status slices up front, so the workers don't modify the shared dicts
+        for plugin in plugins:
+            self.plugin_specific(plugin.plugin_name, self.config)
+            self.plugin_specific(plugin.plugin_name, self.status)
+        if any(self.needs_enricher(plugin) for plugin in plugins):
+            self.initialize_enricher()
+
+        run_timeout = self.config.get('run_timeout')
+        run_deadline = time.time() + run_timeout if run_timeout else None
+        if jobs <= 1 or len(plugins) <= 1:
+            for plugin in plugins:
+                self.run(plugin, run_deadline)
+        else:
+            self.logger.info("running %d plugins on %d threads", len(plugins), jobs)
+            pool = ThreadPool(min(jobs, len(plugins)))
+            try:
+                pool.map(lambda plugin: self.run(plugin, run_deadline), plugins)
+            finally:
+                pool.close()
+
+    def plugin_deadline(self, plugin, run_deadline=None):
+        plugin_config = self.plugin_specific(plugin.plugin_name, self.config)
+        timeout = plugin_config.get('timeout', self.config.get('plugin_timeout'))
+        deadlines = [deadline for deadline in [run_deadline, time.time() + timeout if timeout else None]
+                     if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def needs_enricher(self, plugin):
+        return len(inspect.getargspec(plugin.init)[0]) != 4
 
-    def run(self, plugin):
+    def run(self, plugin, run_deadline=None):
+        self.logger.info('run_plugin: %s', plugin.plugin_name)
         plugin_config = self.plugin_specific(plugin.plugin_name, self.config)
         plugin_status = self.plugin_specific(plugin.plugin_name, self.status)
-        init_arg_count = len(inspect.getargspec(plugin.init)[0])
-        if init_arg_count == 4:
-            plugin.init(self.edda_client, plugin_config, plugin_status)
+        stats = QueryStats()
+        extra_args = []
+        if self.needs_enricher(plugin):
+            self.initialize_enricher()
+            extra_args = [self.instance_enricher]
+        init_args = [self.edda_client.with_stats(stats), plugin_config]
+        deadline = self.plugin_deadline(plugin, run_deadline)
+        start = self.metrics.start()
+        if deadline is None:
+            with self.profiler.profile(self.profile_name(plugin)):
+                plugin.init(*(init_args + [plugin_status] + extra_args))
+                results, timed_out = list(self.plugin_alerts(plugin)), False
         else:
-            plugin.init(self.edda_client, plugin_config, plugin_status, self.instance_enricher)
-        results = plugin.run()
-        self.alerter.run(results)
+            results, timed_out = self.run_until(plugin, init_args, plugin_status, extra_args, deadline)
+        if self.account:
+            self.alerter.run(results, self.account)
+        else:
+            self.alerter.run(results)
+        if hasattr(self.status, 'commit'):
+            # the status store writes the status of each plugin as soon as it is done
+            self.status.commit("plugin." + plugin.plugin_name)
+        self.metrics.record(plugin.plugin_name, start, stats, sum(len(r['details']) for r in results),
+                            timed_out=int(timed_out))
+
+    def run_until(self, plugin, init_args, plugin_status, extra_args, deadline):
+        """
+        Runs the plugin on a worker thread until the deadline. The plugin works on a copy of its status,
+        which is kept only if it finishes in time. If it overruns, the alerts it has yielded so far are
+        returned, and its status is left as it was before the run.
+        """
+        previous_worker = overrunning_workers.get(plugin.plugin_name)
+        if previous_worker and previous_worker.is_alive():
+            self.logger.error("Plugin %s is still running since its previous deadline, skipping it", plugin.plugin_name)
+            return [], True
+        if deadline <= time.time():
+            self.logger.error("Plugin %s is past the deadline of the run, skipping it", plugin.plugin_name)
+            return [], True
+
+        status_copy = copy.deepcopy(dict(plugin_status))
+        results = []
+        outcome = {}
+        cancelled = threading.Event()
+
+        def work():
+            try:
+                with self.profiler.profile(self.profile_name(plugin)):
+                    plugin.init(*(init_args + [status_copy] + extra_args))
+                    for result in self.plugin_alerts(plugin):
+                        if cancelled.is_set():
+                            return
+                        results.append(result)
+                outcome['finished'] = True
+            except Exception:
+                outcome['error'] = sys.exc_info()
+
+        worker = threading.Thread(target=work, name='plugin-' + plugin.plugin_name)
+        worker.daemon = True
+        worker.start()
+        worker.join(max(0, deadline - time.time()))
+        cancelled.set()
+
+        if 'error' in outcome:
+            error = outcome['error']
+            raise error[0], error[1], error[2]
+        if outcome.get('finished'):
+            plugin_status.clear()
+            plugin_status.update(status_copy)
+            return results, False
+
+        overrunning_workers[plugin.plugin_name] = worker
+        self.logger.error("Plugin %s overran its deadline, emitting its %d alerts so far",
+                          plugin.plugin_name, len(results))
+        return list(results), True
+
+    def plugin_alerts(self, plugin):
+        # an incremental plugin's run() is list(self.do_run()): the do_run() generator is iterated instead, so
+        # the alerts found before the deadline are kept if the plugin overruns it
+        if getattr(plugin.__class__, 'incremental', False):
+            return plugin.do_run()
+        return plugin.run()
+
+    def profile_name(self, plugin):
+        return '%s.%s' % (self.account, plugin.plugin_name) if self.account else plugin.plugin_name
 
     def plugin_specific(self, plugin_name, ctx):
         search_name = "plugin." + plugin_name
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import logging
+import signal
+import time
+
+from coordinator import Coordinator
+from instanceenricher import InstanceEnricher
+from metrics import RunMetrics
+from profiler import NullProfiler
+
+# hack to avoid race condition within EDDA: it's possible instances are synced while eg security groups aren't.
+EDDA_DELAY = 5 * 60
+
+
+class Daemon:
+    """
+    Runs the plugins periodically, each at its own interval, in a single long-running process. The EDDA
+    response cache, the connection pool and the instance enricher are kept between ticks.
+
+    The end of the time window (until) of the last run of every plugin is stored in the status under
+    'schedule', and it is the start (since) of the next run of the plugin.
+    """
+
+    def __init__(self, edda_client, alerter, config, status, plugins, save_status,
+                 prefetch_threads=8, jobs=1, tick=60, default_interval=3600, profiler=None):
+        self.logger = logging.getLogger("Daemon")
+        self.edda_client = edda_client
+        self.alerter = alerter
+        self.config = config
+        self.status = status
+        self.plugins = plugins
+        self.save_status = save_status
+        self.prefetch_threads = prefetch_threads
+        self.jobs = jobs
+        self.tick_seconds = tick
+        self.default_interval = default_interval
+        # the profiles of each tick overwrite the ones of the previous tick
+        self.profiler = profiler or NullProfiler()
+        self.instance_enricher = InstanceEnricher(edda_client)
+        self.schedule = status.setdefault('schedule', {})
+        self.stopped = False
+
+    def interval(self, plugin):
+        return self.config.get("plugin." + plugin.plugin_name, {}).get('interval', self.default_interval)
+
+    def since(self, plugin):
+        return self.schedule.get(plugin.plugin_name, self.status.get('since', 0))
+
+    def due_plugins(self, until):
+        return [plugin for plugin in self.plugins
+                if plugin.plugin_name not in self.schedule or
+                until - self.schedule[plugin.plugin_name] >= self.interval(plugin) * 1000]
+
+    def tick(self, now=None):
+        until = int(now or time.time()) * 1000 - EDDA_DELAY * 1000
+        due = self.due_plugins(until)
+        if not due:
+            return None
+        self.logger.info("tick: running %s", [plugin.plugin_name for plugin in due])
+
+        # plugins are run together if their time windows are the same, so they can share the prefetched data
+        windows = {}
+        for plugin in due:
+            windows.setdefault(self.since(plugin), []).append(plugin)
+
+        metrics = RunMetrics()
+        for since, plugins in sorted(windows.items()):
+            coordinator = Coordinator(self.edda_client.since(since).until(until), self.alerter, self.config,
+                                      self.status, self.instance_enricher, profiler=self.profiler)
+            coordinator.prefetch(plugins, self.prefetch_threads)
+            coordinator.run_all(plugins, self.jobs)
+            coordinator.log_cache_stats()
+            metrics.plugins.update(coordinator.metrics.plugins)
+            for plugin in plugins:
+                self.schedule[plugin.plugin_name] = until
+
+        with self.profiler.profile('send_alerts'):
+            self.alerter.send_alerts(self.config)
+        self.alerter.recorded_alerts = []
+        self.status['since'] = until
+        self.save_status(self.status, metrics)
+
+        # the time windows move on, the responses of this tick are not needed anymore
+        if hasattr(self.edda_client._cache, 'expire'):
+            self.edda_client._cache.expire()
+        return metrics
+
+    def stop(self, *args):
+        self.logger.info("stopping after the current tick")
+        self.stopped = True
+
+    def run_forever(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        while not self.stopped:
+            started = time.time()
+            try:
+                self.tick(started)
+            except Exception:
+                # a failing tick (eg. EDDA is down) is retried at the next one
+                self.logger.exception("Tick failed")
+            while not self.stopped and time.time() - started < self.tick_seconds:
+                time.sleep(min(1, self.tick_seconds))
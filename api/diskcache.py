@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+
+def collection_name(uri):
+    # '/api/v2/view/instances;_expand' -> 'instances'
+    parts = uri.split(';')[0].strip('/').split('/')
+    return parts[3] if len(parts) > 3 else parts[-1]
+
+
+class DiskCache:
+    """
+    Persistent cache of decoded EDDA responses, shared between runs.
+
+    Entries expire after a per-collection TTL (seconds, `ttl` maps collection name to TTL, the `default` key
+    applies to the rest). A TTL of 0 disables caching for that collection. When the cache directory grows
+    above `max_bytes`, the least recently used entries are removed.
+    """
+
+    def __init__(self, directory, ttl=None, max_bytes=None):
+        self.logger = logging.getLogger("DiskCache")
+        self.directory = directory
+        self.ttl = ttl or {}
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get_ttl(self, uri):
+        return self.ttl.get(collection_name(uri), self.ttl.get('default', 0))
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url).hexdigest() + '.json')
+
+    def get(self, uri, url):
+        ttl = self.get_ttl(uri)
+        if not ttl:
+            return None
+        path = self._path(url)
+        try:
+            mtime = os.path.getmtime(path)
+            if time.time() - mtime > ttl:
+                self.logger.debug("expired: '%s'", url)
+                os.remove(path)
+                return None
+            with open(path, 'r') as cache_file:
+                response = json.load(cache_file)
+            # access time drives the LRU eviction, the modification time is the fetch time
+            os.utime(path, (time.time(), mtime))
+            self.logger.info("disk cache hit: '%s'", url)
+            return response
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            self.logger.warning("Corrupt cache entry for '%s', removing", url)
+            self._remove(path)
+            return None
+
+    def size(self, url):
+        try:
+            return os.path.getsize(self._path(url))
+        except OSError:
+            return 0
+
+    def put(self, uri, url, response):
+        if not self.get_ttl(uri):
+            return
+        path = self._path(url)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump(response, cache_file)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            self.logger.exception("Failed to write cache entry for '%s'", url)
+            return
+        self.evict()
+
+    def evict(self):
+        if not self.max_bytes:
+            return
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                    entries.append((st.st_atime, st.st_size, name))
+                except OSError:
+                    pass
+        total = sum(e[1] for e in entries)
+        for atime, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.logger.debug("evicting '%s'", name)
+            self._remove(os.path.join(self.directory, name))
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
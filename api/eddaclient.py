@@ -1,8 +1,46 @@
 #!/usr/bin/env python
 import logging
 import json
+import re
+import threading
 import urllib2
 
+from jsonstream import JSONArrayStream
+from metrics import QueryStats
+from responsecache import ResponseCache
+
+CHUNK_SIZE = 64 * 1024
+
+# bytes received by the request in progress on the current thread, the size of the response in the cache
+received = threading.local()
+
+# collections whose time-window and updated-only views can be computed from a single snapshot
+LOCAL_VIEW_URI = re.compile(r'^/api/v2/(aws|view)/\w+;_expand$')
+
+
+def field_selector(fields):
+    """
+    Converts a list of dotted field paths to EDDA's field selection syntax, eg.
+    ['instanceId', 'tags.key', 'tags.value'] -> '(instanceId,tags:(key,value))'
+    """
+    tree = {}
+    for field in fields:
+        node = tree
+        parts = field.split('.')
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                # the whole field is selected already
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+
+    def render(node):
+        return '(%s)' % ','.join(name if sub is None else '%s:%s' % (name, render(sub))
+                                 for name, sub in sorted(node.iteritems()))
+
+    return render(tree)
+
 
 class EddaException(Exception):
 
@@ -11,16 +49,6 @@ class EddaException(Exception):
         self.response = ret
 
 
-class BetterHTTPErrorProcessor(urllib2.BaseHandler):
-    # a substitute/supplement to urllib2.HTTPErrorProcessor
-    # that doesn't raise exceptions on status codes 400
-
-    def http_error_400(self, request, response, code, msg, hdrs):
-        return response
-
-opener = urllib2.build_opener(BetterHTTPErrorProcessor)
-urllib2.install_opener(opener)
-
 
 class EddaClient:
 
@@ -31,7 +59,13 @@ class EddaClient:
         self._since = None
         self._until = None
         self._updateonly = False
-        self._cache = {}
+        self._cache = ResponseCache()
+        self._disk_cache = None
+        # the HTTPTransport (connection pool) shared by the clones, see with_transport and transport
+        self._transport = None
+        self._local_views = False
+        self._projections = {}
+        self._stats = QueryStats()
 
     def clone(self):
         edda_client = EddaClient(self._edda_url)
@@ -40,6 +74,11 @@ class EddaClient:
         edda_client._until = self._until
         edda_client._updateonly = self._updateonly
         edda_client._cache = self._cache
+        edda_client._disk_cache = self._disk_cache
+        edda_client._transport = self._transport
+        edda_client._local_views = self._local_views
+        edda_client._projections = self._projections
+        edda_client._stats = self._stats
         return edda_client
 
     def clone_modify(self, uv):
@@ -50,17 +89,101 @@ class EddaClient:
 
     def query(self, uri):
         url = self._construct_uri(uri)
-        if url in self._cache:
-            return self._cache[url]
+        self._stats.add('queries')
+        response = self._cache.get(url)
+        if response is not None:
+            self._stats.add('cache_hits')
+            return response
+        self._stats.add('cache_misses')
+        if self._local_views and not self._every and LOCAL_VIEW_URI.match(uri):
+            # the records are shared with the cached snapshot
+            response = self.local_view(uri)
+            if response is not None:
+                self._cache.put(url, response)
+                return response
+        response = self._disk_cache.get(uri, url) if self._disk_cache else None
+        if response is not None:
+            size = self._disk_cache.size(url)
         else:
+            received.bytes = 0
             response = self.do_query(url)
-            self._cache[url] = response
-            return response
+            size = received.bytes
+            if self._disk_cache:
+                self._disk_cache.put(uri, url, response)
+        self._cache.put(url, response, size)
+        return response
+
+    def local_view(self, uri):
+        """
+        Computes the result of the query from the current snapshot of the collection, using the
+        per-record timestamps of EDDA. The snapshot is fetched once and shared by every view.
+        Records deleted from the collection are not part of the snapshot, so they are missing from
+        the time-window views as well. Returns None if a record of the snapshot was modified after
+        the end of the time window: EDDA would return its previous revision, which only it has.
+        """
+        snapshot = self.clean().query(uri + ';_meta')
+        if self._until is not None and any((record.get('stime') or 0) > self._until for record in snapshot):
+            return None
+        return [record['data'] for record in snapshot if self._in_view(record)]
+
+    def _in_view(self, record):
+        stime = record.get('stime') or 0
+        ltime = record.get('ltime')
+        if self._since is not None and ltime is not None and ltime < self._since:
+            return False
+        if self._updateonly and self._since is not None and stime < self._since:
+            return False
+        return True
+
+    def iter_query(self, uri):
+        """
+        Yields the records of a (list) response one by one, for the plugins reading a collection once. Unless
+        cached, the response is streamed: neither it nor the list of its records is kept in memory.
+        """
+        url = self._construct_uri(uri)
+        if self._disk_cache or (self._local_views and not self._every and LOCAL_VIEW_URI.match(uri)):
+            # these need the whole response
+            return iter(self.query(uri))
+        self._stats.add('queries')
+        response = self._cache.get(url)
+        if response is not None:
+            self._stats.add('cache_hits')
+            return iter(response)
+        self._stats.add('cache_misses')
+        return self.do_stream_query(url)
 
     def do_query(self, url):
         self.logger.info("do_query: '%s'", url)
+        stream = self._open_stream(url)
+        if not stream.is_array():
+            return self._decode_response(stream.read_all())
+        try:
+            return list(stream)
+        except ValueError as e:
+            raise ValueError('%s, response: %s' % (e, stream.read_all()[:1024]))
+
+    def do_stream_query(self, url):
+        self.logger.info("do_stream_query: '%s'", url)
+        stream = self._open_stream(url)
+        if not stream.is_array():
+            # not a list, yield the response as is
+            yield self._decode_response(stream.read_all())
+            return
+        for record in stream:
+            yield record
+
+    def _open_stream(self, url):
+        self._stats.add('edda_requests')
+        return JSONArrayStream(self._count_bytes(self.transport().iter_content(url, CHUNK_SIZE)))
+
+    def _count_bytes(self, chunks):
+        for chunk in chunks:
+            self._stats.add('bytes', len(chunk))
+            received.bytes = getattr(received, 'bytes', 0) + len(chunk)
+            yield chunk
+
+    def _decode_response(self, response):
         try:
-            response = urllib2.urlopen(url).read()
             ret = json.loads(response)
             if 'code' in ret:
                 # indicates an error in EDDA response
@@ -73,10 +196,12 @@ class EddaClient:
     def raw_query(self, uri):
         url = self._construct_uri(uri)
         self.logger.info("raw_query: '%s'", url)
+        self._stats.add('queries')
+        self._stats.add('edda_requests')
         try:
-            file = urllib2.urlopen(url)
-            ret = file.read()
-            if file.getcode() != 200:
+            code, ret = self.transport().read(url)
+            self._stats.add('bytes', len(ret))
+            if code != 200:
                 print 'EDDAClient got non-200 error code.'
                 try:
                     # indicates an error in EDDA response
@@ -88,8 +213,20 @@ class EddaClient:
             print 'Got HTTPError', e
             return ''
 
+    def _project(self, uri):
+        # apply the field selection configured for the collection, also on its ;_meta variant
+        meta = uri.endswith(';_meta')
+        collection_uri = uri[:-len(';_meta')] if meta else uri
+        fields = self._projections.get(collection_uri)
+        if not fields or not collection_uri.endswith(';_expand'):
+            return uri
+        if meta:
+            return '%s:%s;_meta' % (collection_uri, field_selector(['stime', 'ltime'] +
+                                                                  ['data.' + f for f in fields]))
+        return '%s:%s' % (collection_uri, field_selector(fields))
+
     def _construct_uri(self, uri):
-        base = self._edda_url + uri
+        base = self._edda_url + self._project(uri)
         if self._every:
             base += ';_all'
         if self._since is not None:
@@ -116,8 +253,40 @@ class EddaClient:
     def with_cache(self, cache):
         return self.clone_modify({'_cache': cache})
 
+    def with_disk_cache(self, disk_cache):
+        return self.clone_modify({'_disk_cache': disk_cache})
+
+    def transport(self):
+        if self._transport is None:
+            # created on first use if none was set with with_transport: then it is not shared with the clones
+            # made before, and it has the default timeout and pool size
+            from httptransport import HTTPTransport
+            self._transport = HTTPTransport()
+        return self._transport
+
+    def with_transport(self, transport):
+        return self.clone_modify({'_transport': transport})
+
+    def with_local_views(self, local_views=True):
+        return self.clone_modify({'_local_views': local_views})
+
+    def with_stats(self, stats):
+        return self.clone_modify({'_stats': stats})
+
+    def with_projections(self, projections):
+        """Only the given fields (a list of dotted paths per ;_expand URI) are requested from EDDA."""
+        return self.clone_modify({'_projections': projections})
+
     def clean(self):
-        return EddaClient(self._edda_url)
+        # caches are keyed by the full URL, so it is safe to keep them, along with the connection pool
+        edda_client = EddaClient(self._edda_url)
+        edda_client._cache = self._cache
+        edda_client._disk_cache = self._disk_cache
+        edda_client._transport = self._transport
+        edda_client._local_views = self._local_views
+        edda_client._projections = self._projections
+        edda_client._stats = self._stats
+        return edda_client
 
     def soft_clean(self):
         return self.clean().with_cache(self._cache)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+import logging
+import urllib2
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HTTPTransport:
+    """
+    Keep-alive HTTP connection pool with gzip compressed responses, shared by EddaClient clones.
+
+    Error responses are reported the same way as by the urllib2 opener used before: status code 400
+    (EDDA's error messages) is returned, other error codes raise urllib2.HTTPError.
+    """
+
+    def __init__(self, timeout=60, pool_size=10):
+        self.logger = logging.getLogger("HTTPTransport")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip'
+
+    def get(self, url, timeout=None):
+        response = self.session.get(url, stream=True, timeout=timeout or self.timeout)
+        if response.status_code >= 400 and response.status_code != 400:
+            response.close()
+            raise urllib2.HTTPError(url, response.status_code, response.reason, response.headers, None)
+        return response
+
+    def iter_content(self, url, chunk_size, timeout=None):
+        # decompressed chunks of the response body
+        return self.get(url, timeout).iter_content(chunk_size)
+
+    def read(self, url, timeout=None):
+        response = self.get(url, timeout)
+        return response.status_code, response.content
@@ -1,5 +1,43 @@
 import operator
 import string
+from collections import Mapping
+
+SECURITY_GROUPS_URI = "/api/v2/aws/securityGroups;_expand"
+LOAD_BALANCERS_URI = "/api/v2/aws/loadBalancers;_expand"
+
+# instance fields used by enrich() and instance_report()
+ENRICHED_INSTANCE_FIELDS = ["instanceId", "imageId", "keyName", "launchTime", "publicIpAddress", "privateIpAddress",
+                            "tags.key", "tags.value", "securityGroups.groupId", "iamInstanceProfile.arn",
+                            "placement.availabilityZone"]
+
+
+class EnrichedView(Mapping):
+    """
+    Read-only view of an EDDA record with the enrichment fields laid over it. The record itself, which is
+    shared through the EDDA response cache, is not modified.
+    """
+
+    def __init__(self, record, overlay):
+        self._record = record
+        self._overlay = overlay
+
+    def __getitem__(self, key):
+        if key in self._overlay:
+            return self._overlay[key]
+        return self._record[key]
+
+    def __iter__(self):
+        for key in self._record:
+            yield key
+        for key in self._overlay:
+            if key not in self._record:
+                yield key
+
+    def __len__(self):
+        return len(self._record) + len([key for key in self._overlay if key not in self._record])
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
 
 
 class InstanceEnricher:
@@ -7,13 +45,40 @@ class InstanceEnricher:
         self.edda_client = edda_client.soft_clean()
         self.elbs = []
         self.sec_groups = {}
+        self._elbs_by_instance = {}
+        self._indexed_elbs = None
+        self._indexed_sec_groups = None
+        # enrichment overlays and reports of the current run, keyed by the instance fields they depend on
+        self._overlays = {}
+        self._reports = {}
+        self._responses = (None, None)
+
+    def edda_queries(self):
+        return [(self.edda_client, SECURITY_GROUPS_URI), (self.edda_client, LOAD_BALANCERS_URI)]
+
+    def edda_fields(self):
+        return {
+            SECURITY_GROUPS_URI: ["groupId", "ipPermissions.toPort", "ipPermissions.ipRanges"],
+            LOAD_BALANCERS_URI: ["DNSName", "instances.instanceId", "listenerDescriptions.listener.loadBalancerPort"]
+        }
 
     def initialize_caches(self):
-        self.elbs = self._query_loadbalancers()
-        self.sec_groups = self._query_security_groups()
+        # the results of the previous run are not valid for the instance records of the new one
+        self._overlays = {}
+        self._reports = {}
+        elbs = self.edda_client.query(LOAD_BALANCERS_URI)
+        groups = self.edda_client.query(SECURITY_GROUPS_URI)
+        # a long-running process gets the same responses from the cache until they expire, keep the index then
+        if self._responses[0] is not elbs or self._responses[1] is not groups:
+            self.elbs = self._clean_loadbalancers(elbs)
+            self.sec_groups = self._clean_security_groups(groups)
+            self._responses = (elbs, groups)
+        self._refresh()
 
     def _query_security_groups(self):
-        groups = self.edda_client.query("/api/v2/aws/securityGroups;_expand")
+        return self._clean_security_groups(self.edda_client.query(SECURITY_GROUPS_URI))
+
+    def _clean_security_groups(self, groups):
         return {g["groupId"]: reduce(operator.add, self._clean_ip_permissions(g["ipPermissions"]), []) for g in groups}
 
     def _clean_ip_permissions(self, perms):
@@ -23,9 +88,30 @@ class InstanceEnricher:
         return [{"port": permission["toPort"], "range": r} for r in permission["ipRanges"]]
 
     def _query_loadbalancers(self):
-        elbs = self.edda_client.query("/api/v2/aws/loadBalancers;_expand")
+        return self._clean_loadbalancers(self.edda_client.query(LOAD_BALANCERS_URI))
+
+    def _clean_loadbalancers(self, elbs):
         return [self._clean_elb(e) for e in elbs if len(e.get("instances", [])) > 0]
 
+    def _refresh(self):
+        # rebuild the index and forget memoized results if the ELBs or security groups have been replaced
+        if self._indexed_elbs is self.elbs and self._indexed_sec_groups is self.sec_groups:
+            return
+        index = {}
+        for elb in self.elbs:
+            for instance_id in elb["instances"]:
+                elbs = index.setdefault(instance_id, [])
+                if not elbs or elbs[-1] is not elb:
+                    elbs.append(elb)
+        self._elbs_by_instance = index
+        self._indexed_elbs = self.elbs
+        self._indexed_sec_groups = self.sec_groups
+        self._overlays = {}
+        self._reports = {}
+
+    def _elbs_of_instance(self, instance_id):
+        return list(self._elbs_by_instance.get(instance_id, []))
+
     def _clean_elb(self, elb):
         return {
             "DNSName": elb.get("DNSName"),
@@ -33,18 +119,42 @@ class InstanceEnricher:
             "ports": [l.get("listener", {}).get("loadBalancerPort") for l in elb.get("listenerDescriptions")]
         }
 
+    @staticmethod
+    def _overlay_key(instance_data):
+        # the fields the overlay is computed from: different versions of an instance may differ in them
+        return (instance_data.get("instanceId"), instance_data.get("imageId"),
+                tuple((t.get("key"), t.get("value")) for t in instance_data.get("tags", [])),
+                tuple(sg["groupId"] for sg in instance_data["securityGroups"])
+                if "securityGroups" in instance_data else None)
+
+    @staticmethod
+    def _report_key(instance_data, overlay_key):
+        profile = instance_data.get("iamInstanceProfile")
+        return overlay_key + (instance_data.get("keyName"), instance_data.get("launchTime"),
+                              instance_data.get("publicIpAddress"), instance_data.get("privateIpAddress"),
+                              profile.get("arn") if profile else None,
+                              instance_data.get("placement", {}).get("availabilityZone"))
+
     def enrich(self, instance_data):
-        instance_id = instance_data.get("instanceId")
-        ami = instance_data.get("imageId")
-        instance_data["service_type"] = self._get_type_from_tags(instance_data.get("tags", [])) or ami
-        instance_data["elbs"] = [elb for elb in self.elbs if instance_id in elb["instances"]]
-        self._enrich_security_groups(instance_data)
-        return instance_data
-
-    def _enrich_security_groups(self, instance_data):
+        self._refresh()
+        if isinstance(instance_data, EnrichedView):
+            instance_data = instance_data._record
+        key = self._overlay_key(instance_data)
+        overlay = self._overlays.get(key)
+        if overlay is None:
+            overlay = {
+                "service_type": self._get_type_from_tags(instance_data.get("tags", [])) or instance_data.get("imageId"),
+                "elbs": self._elbs_of_instance(instance_data.get("instanceId"))
+            }
+            self._enrich_security_groups(instance_data, overlay)
+            self._overlays[key] = overlay
+        # the overlay is shared, the record is always the one passed in
+        return EnrichedView(instance_data, overlay)
+
+    def _enrich_security_groups(self, instance_data, overlay):
         if "securityGroups" in instance_data:
-            for sg in instance_data["securityGroups"]:
-                sg["rules"] = self.sec_groups.get(sg["groupId"], [])
+            overlay["securityGroups"] = [EnrichedView(sg, {"rules": self.sec_groups.get(sg["groupId"], [])})
+                                         for sg in instance_data["securityGroups"]]
 
     def _get_type_from_tags(self, tags):
         LOOKUP_ORDER = ["service_name", "Name", "aws:cloudformation:stack-name", "aws:autoscaling:groupName"]
@@ -55,7 +165,15 @@ class InstanceEnricher:
         return None
 
     def report(self, instance_data, extra={}):
-        return instance_report(self.enrich(instance_data), extra)
+        instance_data = self.enrich(instance_data)
+        key = self._report_key(instance_data._record, self._overlay_key(instance_data._record))
+        if key not in self._reports:
+            self._reports[key] = instance_report(instance_data)
+        # a shallow copy: callers may set the keys of the returned report, but its nested values (tags, elbs,
+        # open_ports) are shared with the memoized report and the other callers, they must not be modified
+        result = dict(self._reports[key])
+        result.update(extra)
+        return result
 
 
 def instance_report(instance, extra={}):
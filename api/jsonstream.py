@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+import json
+
+WHITESPACE = ' \t\n\r'
+
+
+class JSONArrayStream:
+    """
+    Decodes a top-level JSON array record by record from an iterable of string chunks, so the raw
+    response does not have to be kept in memory.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.eof:
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.eof = True
+            return False
+        # drop what has already been decoded
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        # returns the next non-whitespace character without consuming it
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def is_array(self):
+        return self._peek() == '['
+
+    def read_all(self):
+        return self.buf[self.pos:] + ''.join(self.chunks)
+
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number at the end of the buffer might continue in the next chunk
+                if end < len(self.buf) or not self._fill():
+                    self.pos = end
+                    return value
+            except ValueError:
+                if not self._fill():
+                    raise
+
+    def __iter__(self):
+        if not self.is_array():
+            raise ValueError('Expecting a JSON array: %r' % self.buf[self.pos:self.pos + 64])
+        self.pos += 1
+        if self._peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            delimiter = self._peek()
+            self.pos += 1
+            if delimiter == ']':
+                return
+            if delimiter != ',':
+                raise ValueError('Expecting , delimiter: %r' % self.buf[self.pos - 1:self.pos + 63])
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+import json
+import logging
+import os
+import resource
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+PROMETHEUS_METRICS = [
+    ('wall_seconds', 'Wall time of the plugin run.'),
+    ('cpu_seconds', 'CPU time of the process while the plugin was running.'),
+    ('peak_memory_delta_bytes', 'Growth of the peak resident memory of the process during the plugin run.'),
+    ('queries', 'Number of EDDA queries made by the plugin.'),
+    ('edda_requests', 'Number of EDDA queries sent over the network.'),
+    ('cache_hits', 'Number of EDDA queries served from the in-memory cache.'),
+    ('cache_misses', 'Number of EDDA queries not found in the in-memory cache.'),
+    ('bytes', 'Bytes of EDDA responses received (decompressed).'),
+    ('alerts', 'Number of alerts produced by the plugin.'),
+    ('timed_out', 'Whether the plugin overran its deadline (1) or not (0).'),
+]
+
+
+class QueryStats:
+    """Thread-safe counters of the EDDA queries made through an EddaClient (and its clones)."""
+
+    def __init__(self):
+        self.counters = dict.fromkeys(['queries', 'edda_requests', 'cache_hits', 'cache_misses', 'bytes'], 0)
+        self._lock = threading.Lock()
+
+    def add(self, counter, value=1):
+        with self._lock:
+            self.counters[counter] += value
+
+
+def cpu_time():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_memory():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RunMetrics:
+    """Per-plugin performance metrics of a run, exported as JSON and in Prometheus' text format."""
+
+    def __init__(self):
+        self.logger = logging.getLogger("RunMetrics")
+        self.started = time.time()
+        self.plugins = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self):
+        return {'wall': time.time(), 'cpu': cpu_time(), 'memory': peak_memory()}
+
+    def record(self, plugin_name, start, query_stats, alerts, **extra):
+        metrics = {
+            'wall_seconds': time.time() - start['wall'],
+            'cpu_seconds': cpu_time() - start['cpu'],
+            'peak_memory_delta_bytes': peak_memory() - start['memory'],
+            'alerts': alerts
+        }
+        metrics.update(query_stats.counters)
+        metrics.update(extra)
+        with self._lock:
+            self.plugins[plugin_name] = metrics
+        self.logger.info("plugin metrics: %s %s", plugin_name, metrics)
+        return metrics
+
+    def as_dict(self):
+        return {'started': int(self.started), 'duration': time.time() - self.started, 'plugins': self.plugins}
+
+    def to_prometheus(self):
+        lines = []
+        for name, description in PROMETHEUS_METRICS:
+            metric = 'reddalert_plugin_' + name
+            lines.append('# HELP %s %s' % (metric, description))
+            lines.append('# TYPE %s gauge' % metric)
+            for plugin_name, metrics in self.plugins.iteritems():
+                lines.append('%s{plugin="%s"} %s' % (metric, plugin_name, float(metrics.get(name, 0))))
+        lines.append('# HELP reddalert_run_duration_seconds Wall time of the whole run.')
+        lines.append('# TYPE reddalert_run_duration_seconds gauge')
+        lines.append('reddalert_run_duration_seconds %s' % float(time.time() - self.started))
+        lines.append('# HELP reddalert_run_timestamp_seconds Start time of the run.')
+        lines.append('# TYPE reddalert_run_timestamp_seconds gauge')
+        lines.append('reddalert_run_timestamp_seconds %s' % float(int(self.started)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, status_file):
+        # statusfile.json -> statusfile.metrics.json and statusfile.prom next to it
+        base = os.path.splitext(status_file)[0]
+        self._write_atomic(base + '.metrics.json', json.dumps(self.as_dict(), indent=4))
+        self._write_atomic(base + '.prom', self.to_prometheus())
+
+    def _write_atomic(self, path, content):
+        # the textfile collector may read the file at any time
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+            with os.fdopen(fd, 'w') as out_data:
+                out_data.write(content)
+            os.chmod(tmp_path, 0644)
+            os.rename(tmp_path, path)
+        except (IOError, OSError):
+            self.logger.exception("Failed to write file '%s'", path)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+import logging
+import socket
+import threading
+import time
+from itertools import izip_longest
+from multiprocessing.pool import ThreadPool
+
+
+def is_port_open(host, port, timeout=3):
+    try:
+        connection = socket.create_connection((host, port), timeout)
+        connection.close()
+        return True
+    except (socket.timeout, socket.error) as e:
+        logging.getLogger("PortProber").debug("%s:%s is not reachable: %s", host, port, e)
+        return False
+
+
+class PortProber:
+    """
+    Checks the reachability of (host, port) pairs on a thread pool of max_workers, with at most per_host
+    connections to the same host at a time. The results are kept in cache (a dict, eg. a part of a plugin's
+    status) for ttl seconds, as "host:port" -> [open, timestamp]. The cache holds at most max_entries
+    results, the oldest ones are dropped first.
+    """
+
+    def __init__(self, check=is_port_open, cache=None, ttl=3600, max_workers=32, per_host=4, max_entries=10000):
+        self.logger = logging.getLogger("PortProber")
+        self.check = check
+        self.cache = cache if cache is not None else {}
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.max_entries = max_entries
+
+    @staticmethod
+    def key(host, port):
+        return '%s:%s' % (host, port)
+
+    def cached(self, host, port, now):
+        entry = self.cache.get(self.key(host, port))
+        if entry and now - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def expire(self, now):
+        for key in [key for key, entry in self.cache.iteritems() if now - entry[1] >= self.ttl]:
+            del self.cache[key]
+
+    def evict(self):
+        if len(self.cache) > self.max_entries:
+            oldest = sorted(self.cache.iteritems(), key=lambda item: item[1][1])
+            for key, entry in oldest[:len(self.cache) - self.max_entries]:
+                del self.cache[key]
+
+    def probe(self, targets):
+        """Returns a dict of (host, port) -> whether the port is open, for the given (host, port) pairs."""
+        return {target: result for (target, ), result in self.probe_any((target, ) for target in targets).iteritems()}
+
+    def probe_any(self, target_groups):
+        """
+        Returns a dict of group -> whether any of its (host, port) pairs is open, for the given groups (tuples of
+        (host, port) pairs). The rest of a group is not probed once a pair of it is found open.
+        """
+        now = time.time()
+        self.expire(now)
+        verdicts = {}
+        missing = []
+        for group in set(target_groups):
+            results = [self.cached(host, port, now) for host, port in group]
+            verdicts[group] = any(results)
+            if not verdicts[group]:
+                # ordered by port, so that the consecutive probes go to different hosts
+                missing.append(sorted([(group, target) for target, result in zip(group, results) if result is None],
+                                      key=lambda task: (task[1][1], task[1][0])))
+        # the groups take turns, so each of them can stop early
+        tasks = [task for tasks in izip_longest(*missing) for task in tasks if task is not None]
+        if not tasks:
+            return verdicts
+
+        host_limits = {host: threading.BoundedSemaphore(self.per_host) for group, (host, port) in tasks}
+        probed = {}
+
+        def probe_one(task):
+            group, target = task
+            if verdicts[group]:
+                return
+            if target not in probed:
+                with host_limits[target[0]]:
+                    if verdicts[group]:
+                        return
+                    probed[target] = bool(self.check(*target))
+            if probed[target]:
+                verdicts[group] = True
+
+        self.logger.info("probing up to %d ports of %d groups", len(tasks), len(missing))
+        pool = ThreadPool(max(1, min(self.max_workers, len(tasks))))
+        try:
+            pool.map(probe_one, tasks)
+        finally:
+            pool.close()
+        self.logger.info("probed %d ports", len(probed))
+        if self.ttl:
+            for (host, port), result in probed.iteritems():
+                self.cache[self.key(host, port)] = [result, now]
+            self.evict()
+        return verdicts
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+import cProfile
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    # Python 2 needs the pytracemalloc backport (and a patched interpreter) for memory snapshots
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+SAMPLE_INTERVAL = 0.005
+TOP_ALLOCATIONS = 25
+
+
+def frame_name(code):
+    # the same notation as pstats
+    return "%s:%d(%s)" % (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+class StackSampler:
+    """Samples the stack of a thread periodically, and counts the distinct stacks seen."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name='stack-sampler')
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        # the input format of flamegraph.pl and speedscope: "root;...;leaf count" per line
+        return ''.join('%s %d\n' % (stack, count) for stack, count in sorted(self.stacks.iteritems()))
+
+
+class Profiler:
+    """
+    Profiles named sections of a run (eg. the plugins), and writes into the directory, for each section:
+    <name>.pstats with cProfile's data, <name>.collapsed with the sampled stacks for flame graphs and,
+    if memory is set and tracemalloc is available, <name>.malloc.txt with the top allocation sites.
+    Only the thread entering the section is profiled, but tracemalloc traces the whole process: the memory
+    profiles are only meaningful if the sections don't run in parallel.
+    """
+
+    def __init__(self, directory, memory=False, interval=SAMPLE_INTERVAL):
+        self.logger = logging.getLogger("Profiler")
+        self.directory = directory
+        self.interval = interval
+        self.memory = memory
+        if memory and tracemalloc is None:
+            self.logger.warning("tracemalloc is not available, memory snapshots are disabled")
+            self.memory = False
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, name, extension):
+        return os.path.join(self.directory, '%s.%s' % (name, extension))
+
+    @contextmanager
+    def profile(self, name):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        memory_start = tracemalloc.take_snapshot() if self.memory else None
+        sampler = StackSampler(threading.current_thread().ident, self.interval)
+        profile = cProfile.Profile()
+        sampler.start()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            sampler.stop()
+            self.write(name, profile, sampler, memory_start)
+
+    def write(self, name, profile, sampler, memory_start):
+        try:
+            profile.dump_stats(self.path(name, 'pstats'))
+            with open(self.path(name, 'collapsed'), 'w') as collapsed_file:
+                collapsed_file.write(sampler.collapsed())
+            if memory_start is not None:
+                allocations = tracemalloc.take_snapshot().compare_to(memory_start, 'lineno')
+                with open(self.path(name, 'malloc.txt'), 'w') as malloc_file:
+                    malloc_file.write(''.join('%s\n' % stat for stat in allocations[:TOP_ALLOCATIONS]))
+            self.logger.info("profile of %s written into %s", name, self.directory)
+        except (IOError, OSError):
+            self.logger.exception("Failed to write the profile of %s", name)
+
+
+class NullProfiler:
+    """Used when profiling is off."""
+
+    @contextmanager
+    def profile(self, name):
+        yield
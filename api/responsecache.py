@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Thread-safe in-memory cache of EDDA responses with an optional byte budget, counted in the bytes of
+    the responses as received (see put). When the budget is exceeded, the least recently used responses
+    are evicted. With a ttl (in seconds), responses older than that are not served, so a long-running
+    process sees fresh EDDA data.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        self.logger = logging.getLogger("ResponseCache")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries and not self._expired(key)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, key):
+        with self._lock:
+            if self._expired(key):
+                self._remove(key)
+                raise KeyError(key)
+            entry = self._entries.pop(key)
+            self._entries[key] = entry
+            return entry[0]
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            if self._expired(key):
+                self._remove(key)
+                self.misses += 1
+                return default
+            self.hits += 1
+            entry = self._entries.pop(key)
+            self._entries[key] = entry
+            return entry[0]
+
+    def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def put(self, key, value, size=0):
+        # size: the length of the raw response, 0 for values sharing their records with other entries
+        if self.max_bytes and size > self.max_bytes:
+            self.logger.warning("Response of %d bytes does not fit in the cache: '%s'", size, key)
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size, time.time())
+            self.size += size
+            while self.max_bytes and self.size > self.max_bytes:
+                evicted_key, (evicted, evicted_size, stored) = self._entries.popitem(last=False)
+                self.logger.debug("evicting '%s'", evicted_key)
+                self.size -= evicted_size
+                self.evictions += 1
+
+    def _expired(self, key):
+        return self.ttl is not None and time.time() - self._entries[key][2] >= self.ttl
+
+    def _remove(self, key):
+        self.size -= self._entries.pop(key)[1]
+        self.expirations += 1
+
+    def expire(self):
+        # drops the expired responses, which would otherwise be kept until they are requested again
+        with self._lock:
+            for key in [key for key in self._entries if self._expired(key)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import MutableMapping
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite')
+# the top-level values which are not dicts (eg. since) are stored in this namespace
+ROOT = ''
+# the value of a key whose value is a dict: its items are stored in separate rows
+ITEMS = None
+
+
+def is_sqlite_status(path):
+    return os.path.splitext(path)[1] in SQLITE_EXTENSIONS
+
+
+def serialize(value):
+    return json.dumps(value, sort_keys=True)
+
+
+class StatusNamespace(MutableMapping):
+    """
+    The status of a plugin (a top-level dict of the status) in the SQLite status store. The values are
+    loaded when they are first accessed, and only the changed ones are written back by commit. The dict
+    values (eg. first_seen) are stored item by item, so only their changed items are written.
+    """
+
+    def __init__(self, store, name):
+        self.store = store
+        self.name = name
+        self._keys = None
+        self._values = {}
+        # the serialized form of the loaded or committed values, and of the items of the dict values
+        self._stored = {}
+        self._stored_items = {}
+        self._deleted = set()
+
+    def keys_set(self):
+        if self._keys is None:
+            self._keys = set(self.store.select_keys(self.name))
+        return self._keys
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self.keys_set():
+                raise KeyError(key)
+            stored = self.store.select_value(self.name, key)
+            self._stored[key] = stored
+            if stored is ITEMS:
+                self._stored_items[key] = dict(self.store.select_items(self.name, key))
+                self._values[key] = {item: json.loads(value) for item, value in self._stored_items[key].iteritems()}
+            else:
+                self._values[key] = json.loads(stored)
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+        if isinstance(value, dict) and key in self.keys_set() and key not in self._stored:
+            # the stored items are read to write only the changed ones
+            self[key]
+        self.keys_set().add(key)
+        self._deleted.discard(key)
+        self._values[key] = value
+
+    def __delitem__(self, key):
+        if key not in self.keys_set():
+            raise KeyError(key)
+        self._keys.remove(key)
+        self._values.pop(key, None)
+        self._deleted.add(key)
+
+    def __contains__(self, key):
+        return key in self.keys_set()
+
+    def __iter__(self):
+        return iter(list(self.keys_set()))
+
+    def __len__(self):
+        return len(self.keys_set())
+
+    def clear(self):
+        # without loading the values
+        self._deleted.update(self.keys_set())
+        self._keys = set()
+        self._values = {}
+
+    def __repr__(self):
+        return repr(dict(self.iteritems()))
+
+    def changes(self):
+        """
+        Returns the rows to write: the (key, serialized value) pairs to upsert, the keys to delete, the keys whose
+        items are to be deleted, the (key, item, serialized value) triples to upsert and the (key, item) to delete.
+        """
+        # the accessed values may have been modified in place, they are compared to their stored form
+        upserts, cleared, item_upserts, item_deletes = [], [], [], []
+        for key, value in self._values.iteritems():
+            if key not in self._stored:
+                # a new value, or one set without loading the stored one: its items are replaced
+                cleared.append(key)
+            stored = self._stored.get(key, '')
+            if isinstance(value, dict):
+                if stored is not ITEMS:
+                    upserts.append((key, ITEMS))
+                stored_items = self._stored_items.get(key, {}) if stored is ITEMS else {}
+                for item, item_value in value.iteritems():
+                    serialized = serialize(item_value)
+                    if serialized != stored_items.get(item):
+                        item_upserts.append((key, item, serialized))
+                item_deletes.extend((key, item) for item in stored_items if item not in value)
+            else:
+                serialized = serialize(value)
+                if serialized != stored:
+                    upserts.append((key, serialized))
+                    if stored is ITEMS:
+                        cleared.append(key)
+        return upserts, list(self._deleted), cleared, item_upserts, item_deletes
+
+    def committed(self, upserts, deletes, cleared, item_upserts, item_deletes):
+        for key in cleared:
+            self._stored_items[key] = {}
+        for key, serialized in upserts:
+            self._stored[key] = serialized
+        for key, item, serialized in item_upserts:
+            self._stored_items.setdefault(key, {})[item] = serialized
+        for key, item in item_deletes:
+            del self._stored_items[key][item]
+        for key in deletes:
+            self._stored.pop(key, None)
+            self._stored_items.pop(key, None)
+        self._deleted.difference_update(deletes)
+
+
+class SQLiteStatus(MutableMapping):
+    """
+    Status of the plugins in an SQLite database, indexed by (namespace, key). The top-level dicts of the
+    status (eg. plugin.ami) are namespaces, their keys are stored in separate rows, and the items of their
+    dict values in the items table, indexed by (namespace, key, item). The namespaces are loaded lazily,
+    so a run doesn't read the history of the plugins it doesn't run.
+
+    On the first use, the JSON status file of the same name is imported, if it exists.
+    """
+
+    def __init__(self, path, migrate_from=None):
+        self.logger = logging.getLogger("SQLiteStatus")
+        exists = os.path.exists(path)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS status ("
+                                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, "
+                                "PRIMARY KEY (namespace, key))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS items ("
+                                "namespace TEXT NOT NULL, key TEXT NOT NULL, item TEXT NOT NULL, value TEXT NOT NULL, "
+                                "PRIMARY KEY (namespace, key, item))")
+        self._lock = threading.RLock()
+        self._namespaces = {}
+        self._dropped = set()
+        self._root = StatusNamespace(self, ROOT)
+        with self._lock:
+            names = self.connection.execute("SELECT DISTINCT namespace FROM status WHERE namespace != ?", (ROOT,))
+            self._names = set(row[0] for row in names)
+        if not exists and migrate_from and os.path.exists(migrate_from):
+            self.migrate(migrate_from)
+
+    def migrate(self, json_file):
+        self.logger.info("Importing the status from '%s'", json_file)
+        with open(json_file, 'r') as status_data:
+            status = json.load(status_data)
+        for name, value in status.iteritems():
+            self[name] = value
+        self.commit()
+
+    def select_keys(self, namespace):
+        with self._lock:
+            return [row[0] for row in self.connection.execute(
+                "SELECT key FROM status WHERE namespace = ?", (namespace,))]
+
+    def select_value(self, namespace, key):
+        with self._lock:
+            return self.connection.execute(
+                "SELECT value FROM status WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()[0]
+
+    def select_items(self, namespace, key):
+        with self._lock:
+            return self.connection.execute(
+                "SELECT item, value FROM items WHERE namespace = ? AND key = ?", (namespace, key)).fetchall()
+
+    def __getitem__(self, name):
+        if name in self._names:
+            if name not in self._namespaces:
+                self._namespaces[name] = StatusNamespace(self, name)
+            return self._namespaces[name]
+        return self._root[name]
+
+    def __setitem__(self, name, value):
+        if isinstance(value, dict):
+            if name in self._root:
+                del self._root[name]
+            namespace = self[name] if name in self._names else None
+            if namespace is None:
+                self._names.add(name)
+                self._dropped.discard(name)
+                namespace = self[name]
+            namespace.clear()
+            namespace.update(value)
+        else:
+            if name in self._names:
+                del self[name]
+            self._root[name] = value
+
+    def __delitem__(self, name):
+        if name in self._names:
+            self._names.remove(name)
+            self._namespaces.pop(name, None)
+            self._dropped.add(name)
+        else:
+            del self._root[name]
+
+    def __contains__(self, name):
+        return name in self._names or name in self._root
+
+    def __iter__(self):
+        return iter(list(self._names) + list(self._root))
+
+    def __len__(self):
+        return len(self._names) + len(self._root)
+
+    def setdefault(self, name, default=None):
+        # returns the stored namespace, not the default dict
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def __repr__(self):
+        return repr(dict((name, dict(value) if isinstance(value, StatusNamespace) else value)
+                         for name, value in self.iteritems()))
+
+    def commit(self, name=None):
+        """Writes the changes of a namespace (or all of them) in a transaction."""
+        with self._lock:
+            if name is None:
+                namespaces = [self._root] + self._namespaces.values()
+                dropped = list(self._dropped)
+            else:
+                namespaces = [self._namespaces[name]] if name in self._namespaces else []
+                dropped = [name] if name in self._dropped else []
+            changes = [(namespace, namespace.changes()) for namespace in namespaces]
+            with self.connection:
+                for namespace_name in dropped:
+                    self.connection.execute("DELETE FROM status WHERE namespace = ?", (namespace_name,))
+                    self.connection.execute("DELETE FROM items WHERE namespace = ?", (namespace_name,))
+                for namespace, (upserts, deletes, cleared, item_upserts, item_deletes) in changes:
+                    self.connection.executemany("DELETE FROM items WHERE namespace = ? AND key = ?",
+                                                [(namespace.name, key) for key in cleared + deletes])
+                    self.connection.executemany("INSERT OR REPLACE INTO status (namespace, key, value) VALUES (?, ?, ?)",
+                                                [(namespace.name, key, value) for key, value in upserts])
+                    self.connection.executemany("DELETE FROM status WHERE namespace = ? AND key = ?",
+                                                [(namespace.name, key) for key in deletes])
+                    self.connection.executemany("INSERT OR REPLACE INTO items (namespace, key, item, value) "
+                                                "VALUES (?, ?, ?, ?)",
+                                                [(namespace.name, key, item, value) for key, item, value in item_upserts])
+                    self.connection.executemany("DELETE FROM items WHERE namespace = ? AND key = ? AND item = ?",
+                                                [(namespace.name, key, item) for key, item in item_deletes])
+            self._dropped.difference_update(dropped)
+            for namespace, namespace_changes in changes:
+                namespace.committed(*namespace_changes)
+            # the number of the rows written
+            return sum(len(upserts) + len(deletes) + len(item_upserts) + len(item_deletes)
+                       for namespace, (upserts, deletes, cleared, item_upserts, item_deletes) in changes)
+
+    def close(self):
+        with self._lock:
+            self.connection.close()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Stand-ins of EDDA, Chef and the web sites checked by the plugins, serving a synthetic fleet.
+"""
+import json
+import urlparse
+
+EDDA_URL = "http://edda.bench/edda"
+
+
+class FleetTransport:
+    """
+    Serves the collections of the fleet in place of EDDA's HTTP API, so the queries go through the EddaClient
+    (and its caches and JSON streaming) as in production. Time windows and field selection are ignored: every
+    query returns the whole collection.
+    """
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+        self.responses = {path: json.dumps(collection) for path, collection in fleet.collections().iteritems()}
+        self.requests = []
+
+    def path(self, url):
+        return url[len(EDDA_URL):].split(';')[0]
+
+    def iter_content(self, url, chunk_size, timeout=None):
+        self.requests.append(url)
+        content = self.responses.get(self.path(url))
+        if content is None:
+            content = json.dumps(self.user(self.path(url)))
+        for start in xrange(0, len(content), chunk_size):
+            yield content[start:start + chunk_size]
+
+    def read(self, url, timeout=None):
+        return 200, ''.join(self.iter_content(url, 64 * 1024, timeout))
+
+    def user(self, path):
+        # the revisions of a user, the most recent first
+        username = path.rsplit('/', 1)[1]
+        if int(username.rsplit('-', 1)[1]) % 3 == 0:
+            # a new user, with a single document
+            return [{"userName": username, "groups": ["developers"], "accessKeys": []}]
+        return [{"userName": username, "groups": ["developers", "admins"], "accessKeys": []},
+                {"userName": username, "groups": ["developers"], "accessKeys": []}]
+
+
+class FleetChefAPI:
+    """Answers the node searches of ChefClient with the Chef nodes of the fleet."""
+
+    def __init__(self, fleet):
+        self.fleet = fleet
+
+    def request(self, method, path, headers=None, data=None):
+        params = urlparse.parse_qs(urlparse.urlparse(path).query)
+        start, rows = int(params['start'][0]), int(params['rows'][0])
+        attributes = json.loads(data)
+        nodes = self.fleet.chef_nodes[start:start + rows]
+        return json.dumps({"rows": [{"data": {name: node.get(name) for name in attributes}} for node in nodes]})
+
+
+def fetch_url(location):
+    # every other site redirects to HTTPS, the rest are served without X-Frame-Options
+    if hash(location) % 2:
+        return location, {'code': 301, 'headers': {'location': location.replace('http://', 'https://')}}
+    return location, {'code': 200, 'headers': {}}
+
+
+def page_process_for_route53changed(location):
+    return location, {"hash": "%x" % (hash(location) & 0xffffff), "matches": []}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Synthetic EDDA collections and Chef nodes of a fleet of a given size. The sizes of the other collections are
+derived from the number of instances.
+"""
+import random
+import time
+
+ZONE = "example.com."
+PORTS = [22, 80, 443, 3306, 5432, 6379, 8080, 9200]
+IP_RANGES = ["0.0.0.0/0", "10.0.0.0/8", "192.168.0.0/16", "1.2.3.4/32", "5.6.7.0/24"]
+AVAILABILITY_ZONES = ["us-east-1a", "us-east-1b", "eu-west-1a"]
+
+
+def public_ip(i):
+    return "54.%d.%d.%d" % ((i >> 16) & 255, (i >> 8) & 255, i & 255)
+
+
+def private_ip(i):
+    return "10.%d.%d.%d" % ((i >> 16) & 255, (i >> 8) & 255, i & 255)
+
+
+class Fleet:
+    def __init__(self, instance_count, seed=0):
+        self.instance_count = instance_count
+        self.random = random.Random(seed)
+        self.until = int(time.time()) * 1000
+        self.since = self.until - 60 * 60 * 1000
+        self.services = ["service-%d" % s for s in xrange(max(1, instance_count / 20))]
+        self.amis = ["ami-%08x" % a for a in xrange(max(1, instance_count / 50))]
+
+        self.security_groups = [self.security_group(g) for g in xrange(max(10, instance_count / 10))]
+        self.instances = [self.instance(i) for i in xrange(instance_count)]
+        self.load_balancers = [self.load_balancer(e) for e in xrange(max(10, instance_count / 10))]
+        self.hosted_records = [self.hosted_record(r) for r in xrange(max(10, instance_count / 5))]
+        self.iam_users = ["user-%d" % u for u in xrange(max(10, instance_count / 100))]
+        self.chef_nodes = [self.chef_node(instance) for instance in self.instances
+                           if instance["publicIpAddress"] and self.random.random() < 0.9]
+
+    def security_group(self, g):
+        return {
+            "groupId": "sg-%08x" % g,
+            "groupName": "group-%d" % g,
+            "ownerId": "123456789012",
+            "ipPermissions": [self.ip_permission() for p in xrange(self.random.randint(1, 4))]
+        }
+
+    def ip_permission(self):
+        from_port = self.random.choice(PORTS)
+        to_port = from_port if self.random.random() < 0.9 else from_port + self.random.randint(1, 100)
+        return {
+            "fromPort": from_port,
+            "toPort": to_port,
+            "ipProtocol": "tcp",
+            "ipRanges": self.random.sample(IP_RANGES, self.random.randint(1, 2))
+        }
+
+    def instance(self, i):
+        service = self.random.choice(self.services)
+        return {
+            "instanceId": "i-%08x" % i,
+            "imageId": self.random.choice(self.amis),
+            "keyName": "key-%d" % (i % 10),
+            "launchTime": self.since - self.random.randint(-30 * 60, 30 * 24 * 60 * 60) * 1000,
+            "publicIpAddress": public_ip(i) if self.random.random() < 0.8 else None,
+            "privateIpAddress": private_ip(i),
+            "tags": [{"key": "service_name", "value": service}, {"key": "Name", "value": "%s-%d" % (service, i)}],
+            "securityGroups": [{"groupId": g["groupId"], "groupName": g["groupName"]}
+                               for g in self.random.sample(self.security_groups, self.random.randint(1, 3))],
+            "iamInstanceProfile": {"arn": "arn:aws:iam::123456789012:instance-profile/%s" % service},
+            "placement": {"availabilityZone": self.random.choice(AVAILABILITY_ZONES)}
+        }
+
+    def load_balancer(self, e):
+        return {
+            "loadBalancerName": "elb-%d" % e,
+            "DNSName": "elb-%d.us-east-1.elb.amazonaws.com" % e,
+            "canonicalHostedZoneName": "elb-%d.us-east-1.elb.amazonaws.com" % e,
+            "instances": [{"instanceId": instance["instanceId"]}
+                          for instance in self.random.sample(self.instances, min(5, len(self.instances)))],
+            "listenerDescriptions": [{"listener": {"loadBalancerPort": port, "instancePort": 8080}}
+                                     for port in self.random.sample([80, 443, 8080], self.random.randint(1, 2))]
+        }
+
+    def hosted_record(self, r):
+        chance = self.random.random()
+        if chance < 0.6:
+            # points to an instance of the fleet
+            value, record_type = public_ip(self.random.randrange(self.instance_count)), "A"
+        elif chance < 0.8:
+            value, record_type = "203.0.%d.%d" % ((r >> 8) & 255, r & 255), "A"
+        else:
+            value, record_type = "external-%d.example.net" % r, "CNAME"
+        return {
+            "name": "host-%d.%s" % (r, ZONE),
+            "type": record_type,
+            "zone": {"name": ZONE},
+            "resourceRecords": [{"value": value}]
+        }
+
+    def chef_node(self, instance):
+        name = instance["tags"][1]["value"]
+        return {
+            "name": name,
+            "machinename": name,
+            "fqdn": "%s.%s" % (name, ZONE.rstrip(".")),
+            "ipaddress": instance["privateIpAddress"],
+            "cloud_public_ipv4": instance["publicIpAddress"],
+            "cloud_provider": "ec2",
+            "cloud_public_ips": [instance["publicIpAddress"]],
+            "network_interfaces": {"eth0": {"addresses": {instance["privateIpAddress"]: {"family": "inet"}}}},
+            "platform": "ubuntu",
+            "os": "linux",
+            "os_version": "4.4.0"
+        }
+
+    def collections(self):
+        return {
+            "/api/v2/view/instances": self.instances,
+            "/api/v2/aws/securityGroups": self.security_groups,
+            "/api/v2/aws/loadBalancers": self.load_balancers,
+            "/api/v2/aws/hostedRecords": self.hosted_records,
+            "/api/v2/aws/iamUsers": self.iam_users
+        }
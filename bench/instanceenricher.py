@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of InstanceEnricher.enrich, comparing the ELB lookup through the instance -> ELB index with
+the linear scan over every ELB.
+
+Usage: python -m bench.instanceenricher
+"""
+import random
+import time
+
+from mock import Mock
+
+from api.instanceenricher import InstanceEnricher
+
+SIZES = [(1000, 100), (10000, 1000)]
+
+
+def generate(instance_count, elb_count, instances_per_elb=5):
+    instances = [{"instanceId": "i-%08x" % i, "imageId": "ami-1", "tags": [], "securityGroups": []}
+                 for i in xrange(instance_count)]
+    instance_ids = [i["instanceId"] for i in instances]
+    elbs = [{"DNSName": "elb-%d.example.com" % e, "ports": [80],
+             "instances": random.sample(instance_ids, instances_per_elb)}
+            for e in xrange(elb_count)]
+    return instances, elbs
+
+
+def linear_scan(enricher, instance_data):
+    instance_id = instance_data.get("instanceId")
+    return [elb for elb in enricher.elbs if instance_id in elb["instances"]]
+
+
+def measure(func, instances):
+    start = time.time()
+    for instance in instances:
+        func(instance)
+    return time.time() - start
+
+
+def main():
+    random.seed(0)
+    print "%10s %8s %14s %14s" % ("instances", "ELBs", "indexed (s)", "linear (s)")
+    for instance_count, elb_count in SIZES:
+        instances, elbs = generate(instance_count, elb_count)
+        enricher = InstanceEnricher(Mock())
+        enricher.elbs = elbs
+
+        indexed = measure(enricher.enrich, instances)
+        linear = measure(lambda i: linear_scan(enricher, i), instances)
+        print "%10d %8d %14.3f %14.3f" % (instance_count, elb_count, indexed, linear)
+
+
+if __name__ == '__main__':
+    main()
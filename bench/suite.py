@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Runs every plugin (but s3acl, which reads S3 instead of EDDA) and the InstanceEnricher against synthetic fleets,
+and reports the time and memory they take. Each measurement runs in a separate process, so that the peak memory
+of one doesn't hide the others.
+
+Usage: python -m bench.suite [--sizes 1000,10000,100000] [--plugins secgroups,ami] [--timeout 600]
+                             [--baseline bench/baseline.json [--save-baseline] [--threshold 0.25]]
+
+With --baseline, the results are compared with the stored ones, and the suite fails if any of them regressed
+by more than the threshold.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+
+from mock import patch
+
+import bench.fakes as fakes
+from api import Alerter, Coordinator, EddaClient, ResponseCache
+from api.metrics import RunMetrics, QueryStats
+from bench.fleet import Fleet, ZONE
+from plugins import plugin_list
+
+SIZES = [1000, 10000, 100000]
+ENRICHER = 'instance_enricher'
+SKIPPED_PLUGINS = ['s3acl']
+# differences below these are noise
+MIN_SECONDS = 0.05
+MIN_BYTES = 4 * 1024 * 1024
+
+CONFIG = {
+    "plugin.secgroups": {"allowed_ports": [80, 443], "whitelisted_ips": ["10.0.0.0/8"]},
+    "plugin.elbs": {"allowed_ports": [80, 443]},
+    "plugin.iam": {"allowed": ["^user-1\\d*$"]},
+    "plugin.non_chef": {"chef_server_url": "https://chef.bench", "client_key_file": "", "client_name": "bench"},
+    "plugin.route53unknown": {"zone": ZONE, "chef_server_url": "https://chef.bench", "client_key_file": "",
+                              "client_name": "bench"},
+    "plugin.route53changed": {"zone": ZONE},
+    "plugin.sso_unprotected": {"zone": ZONE, "godauth_url": "https://godauth.bench/(.*)",
+                               "sso_url": "https://sso.bench/(.*)"},
+    "plugin.security_headers": {"zone": ZONE}
+}
+
+
+def benchmarked_plugins(selected=None):
+    names = [name for name in sorted(plugin_list.keys()) if name not in SKIPPED_PLUGINS] + [ENRICHER]
+    return [name for name in names if not selected or name in selected]
+
+
+def measure(fleet, name):
+    transport = fakes.FleetTransport(fleet)
+    edda_client = EddaClient(fakes.EDDA_URL).since(fleet.since).until(fleet.until).with_transport(transport)
+    edda_client = edda_client.with_cache(ResponseCache())
+    coordinator = Coordinator(edda_client, Alerter(''), json.loads(json.dumps(CONFIG)), {})
+
+    if name == ENRICHER:
+        metrics = RunMetrics()
+        stats = QueryStats()
+        enricher = coordinator.instance_enricher
+        instances = edda_client.with_stats(stats).query("/api/v2/view/instances;_expand")
+        start = metrics.start()
+        enricher.initialize_caches()
+        for instance in instances:
+            enricher.report(enricher.enrich(instance))
+        return metrics.record(name, start, stats, 0)
+
+    plugin = plugin_list[name]
+    # the EDDA data is fetched up front, the plugin is measured on its own
+    coordinator.prefetch([plugin], 1)
+    with patch('plugins.chef.ChefAPI', lambda *args: fakes.FleetChefAPI(fleet)), \
+            patch('plugins.route53.ChefAPI', lambda *args: fakes.FleetChefAPI(fleet)), \
+            patch('plugins.sso.fetch_url', fakes.fetch_url), \
+            patch('plugins.route53.page_process_for_route53changed', fakes.page_process_for_route53changed), \
+            patch('plugins.secgroups.SecurityGroupPlugin.is_port_open', return_value=False):
+        coordinator.run(plugin)
+    return coordinator.metrics.plugins[name]
+
+
+def measure_in_process(fleet, name, timeout):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=lambda: queue.put(measure(fleet, name)))
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return {'timed_out': 1}
+    if process.exitcode != 0:
+        return {'failed': 1}
+    return queue.get()
+
+
+def regressions(results, baseline, threshold):
+    for size, plugins in sorted(results.iteritems()):
+        for name, metrics in sorted(plugins.iteritems()):
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                continue
+            if metrics.get('timed_out') or metrics.get('failed'):
+                if not (expected.get('timed_out') or expected.get('failed')):
+                    yield size, name, 'did not finish'
+                continue
+            for key, minimum in [('wall_seconds', MIN_SECONDS), ('peak_memory_delta_bytes', MIN_BYTES)]:
+                if key in expected and metrics[key] > max(expected[key] * (1 + threshold), expected[key] + minimum):
+                    yield size, name, '%s %.2f -> %.2f' % (key, expected[key], metrics[key])
+
+
+def format_row(size, name, metrics):
+    if metrics.get('timed_out'):
+        return "%10d %-18s %s" % (size, name, "timed out")
+    if metrics.get('failed'):
+        return "%10d %-18s %s" % (size, name, "failed")
+    return "%10d %-18s %10.3f %10.3f %12.1f %8d %8d" % (
+        size, name, metrics['wall_seconds'], metrics['cpu_seconds'],
+        metrics['peak_memory_delta_bytes'] / 1024.0 / 1024.0, metrics['queries'], metrics['alerts'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks the plugins against synthetic fleets')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SIZES), help='Numbers of instances')
+    parser.add_argument('--plugins', default=None, help='Comma separated list of plugins to run')
+    parser.add_argument('--timeout', type=int, default=600, help='Timeout of a measurement in seconds')
+    parser.add_argument('--baseline', default=None, help='Stored results to compare with')
+    parser.add_argument('--save-baseline', action='store_true', help='Store the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed relative regression')
+    args = parser.parse_args(argv)
+
+    names = benchmarked_plugins(args.plugins.split(',') if args.plugins else None)
+    results = {}
+    print "%10s %-18s %10s %10s %12s %8s %8s" % ("instances", "plugin", "wall (s)", "cpu (s)", "memory (MB)",
+                                                 "queries", "alerts")
+    for size in [int(size) for size in args.sizes.split(',')]:
+        fleet = Fleet(size)
+        results[str(size)] = {}
+        for name in names:
+            metrics = measure_in_process(fleet, name, args.timeout)
+            results[str(size)][name] = metrics
+            print format_row(size, name, metrics)
+            sys.stdout.flush()
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=4, sort_keys=True)
+    elif args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+        failures = list(regressions(results, baseline, args.threshold))
+        for size, name, reason in failures:
+            print "REGRESSION %s instances %s: %s" % (size, name, reason)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
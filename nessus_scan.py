@@ -10,7 +10,8 @@ if __name__ == '__main__':
     import boto.sqs
     import json
     import itertools
-    from api import EddaClient
+    from api import EddaClient, HTTPTransport
+    from api.profiler import NullProfiler, Profiler
 
     parser = argparse.ArgumentParser(description='Runs tests against AWS configuration')
     parser.add_argument('--configfile', '-c', default='etc/configfile.json', help='Configuration file')
@@ -26,6 +27,10 @@ if __name__ == '__main__':
     parser.add_argument('--edda', '-e', help='Edda base URL')
     parser.add_argument('--sentry', default=None, help='Sentry url with user:pass (optional)')
     parser.add_argument('--silent', '-l', action="count", help='Supress log messages lower than warning')
+    parser.add_argument('--profile', default=None,
+                        help='Write the cProfile data and the sampled stacks of each phase into a directory')
+    parser.add_argument('--profile-memory', action="count",
+                        help='Also write the top allocation sites of each phase (needs tracemalloc)')
     args = parser.parse_args()
 
     root_logger = logging.getLogger()
@@ -64,14 +69,17 @@ if __name__ == '__main__':
         root_logger.critical('Missing policy-id or scan-name argument.')
         sys.exit()
 
+    profiler = Profiler(args.profile, memory=bool(args.profile_memory)) if args.profile else NullProfiler()
+
     # Setup EDDA client
     edda_url = Reddalert.get_config('edda', config, args.edda)
-    edda_client = EddaClient(edda_url).until(args.until)
-    instance_enricher = InstanceEnricher(edda_client)
-    instance_enricher.initialize_caches()
+    edda_client = EddaClient(edda_url).until(args.until).with_transport(HTTPTransport())
+    with profiler.profile('instance_enricher'):
+        instance_enricher = InstanceEnricher(edda_client)
+        instance_enricher.initialize_caches()
 
-    instances = edda_client.query("/api/v2/view/instances;_expand")
-    enriched_instances = [instance_enricher.report(instance) for instance in instances]
+        instances = edda_client.query("/api/v2/view/instances;_expand")
+        enriched_instances = [instance_enricher.report(instance) for instance in instances]
     grouped_by_service_type = itertools.groupby(sorted(enriched_instances, key=lambda i: i['service_type']),
                                                 key=lambda i: i['service_type'])
     service_types = []
@@ -133,8 +141,9 @@ if __name__ == '__main__':
                                          "scan_name": "%s %s %s - ELB" % (
                                              args.scan_name, enriched_instance.get("service_type"), target_ports)})
 
-    for event in messages_to_send:
-        root_logger.info('Sending event to SQS queue: %s' % event)
-        message = boto.sqs.message.RawMessage()
-        message.set_body(json.dumps(event))
-        sqs_queue.write(message)
+    with profiler.profile('send_events'):
+        for event in messages_to_send:
+            root_logger.info('Sending event to SQS queue: %s' % event)
+            message = boto.sqs.message.RawMessage()
+            message.set_body(json.dumps(event))
+            sqs_queue.write(message)
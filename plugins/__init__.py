@@ -1,25 +1,55 @@
-from ami import NewAMIPlugin
-from elbs import ElasticLoadBalancerPlugin
-from iam import UserAddedPlugin
-from instancetags import MissingInstanceTagPlugin, NewInstanceTagPlugin
-from s3acl import S3AclPlugin
-from secgroups import SecurityGroupPlugin
-from chef import NonChefPlugin
-from route53 import Route53Unknown, Route53Changed
-from sso import SSOUnprotected, SecurityHeaders
-
-
-plugin_list = {
-    'secgroups': SecurityGroupPlugin(),
-    'ami': NewAMIPlugin(),
-    'elbs': ElasticLoadBalancerPlugin(),
-    'newtag': NewInstanceTagPlugin(),
-    'missingtag': MissingInstanceTagPlugin(),
-    'iam': UserAddedPlugin(),
-    's3acl': S3AclPlugin(),
-    'non_chef': NonChefPlugin(),
-    'route53unknown': Route53Unknown(),
-    'route53changed': Route53Changed(),
-    'sso_unprotected': SSOUnprotected(),
-    'security_headers': SecurityHeaders()
+"""
+Registry of the rules. A plugin module (and the libraries it depends on, eg. boto or pychef) is imported only
+when its rule is selected: import the plugin classes from their modules, eg. plugins.secgroups.
+"""
+import importlib
+import threading
+from collections import Mapping
+
+PLUGINS = {
+    'secgroups': 'secgroups:SecurityGroupPlugin',
+    'ami': 'ami:NewAMIPlugin',
+    'elbs': 'elbs:ElasticLoadBalancerPlugin',
+    'newtag': 'instancetags:NewInstanceTagPlugin',
+    'missingtag': 'instancetags:MissingInstanceTagPlugin',
+    'iam': 'iam:UserAddedPlugin',
+    's3acl': 's3acl:S3AclPlugin',
+    'non_chef': 'chef:NonChefPlugin',
+    'route53unknown': 'route53:Route53Unknown',
+    'route53changed': 'route53:Route53Changed',
+    'sso_unprotected': 'sso:SSOUnprotected',
+    'security_headers': 'sso:SecurityHeaders'
 }
+
+
+def load_class(path):
+    module_name, class_name = path.split(':')
+    return getattr(importlib.import_module(__name__ + '.' + module_name), class_name)
+
+
+class PluginRegistry(Mapping):
+    """Maps rule names to plugin instances, which are created on first access."""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self._plugins = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._plugins:
+                self._plugins[name] = load_class(self.paths[name])()
+            return self._plugins[name]
+
+    def __contains__(self, name):
+        return name in self.paths
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+
+plugin_list = PluginRegistry(PLUGINS)
+
@@ -1,8 +1,9 @@
 #!/usr/bin/env python
 
-from api import InstanceEnricher
+from api import InstanceEnricher, ENRICHED_INSTANCE_FIELDS
 
 class NewAMIPlugin:
+    incremental = True
 
     def __init__(self):
         self.plugin_name = 'ami'
@@ -18,6 +19,12 @@ class NewAMIPlugin:
             status['first_seen'] = {}
         self.status = status
 
+    def edda_queries(self, edda_client, config):
+        return [(edda_client.soft_clean(), "/api/v2/view/instances;_expand")]
+
+    def edda_fields(self, config):
+        return {"/api/v2/view/instances;_expand": ENRICHED_INSTANCE_FIELDS}
+
     def run(self):
         return list(self.do_run())
 
@@ -29,7 +36,7 @@ class NewAMIPlugin:
 
     def do_run(self):
         since = self.edda_client._since if self.edda_client._since is not None else 0
-        machines = self.edda_client.soft_clean().query("/api/v2/view/instances;_expand")
+        machines = self.edda_client.soft_clean().iter_query("/api/v2/view/instances;_expand")
 
         grouped_by_ami = {}
         for m in machines:
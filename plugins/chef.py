@@ -9,12 +9,14 @@ from IPy import IP
 from chef import ChefAPI
 
 from api.chefclient import ChefClient
+from api.instanceenricher import ENRICHED_INSTANCE_FIELDS
 
 
 class NonChefPlugin:
     """
     Returns those EC2 instances which do not have a corresponding Chef entry based on the public IPv4 address.
     """
+    incremental = True
 
     def __init__(self):
         self.plugin_name = 'non_chef'
@@ -55,8 +57,14 @@ class NonChefPlugin:
                 return True
         return False
 
+    def edda_queries(self, edda_client, config):
+        return [(edda_client.soft_clean(), "/api/v2/view/instances;_expand")]
+
+    def edda_fields(self, config):
+        return {"/api/v2/view/instances;_expand": ENRICHED_INSTANCE_FIELDS}
+
     def run(self):
-        return list(self.do_run()) if self.api else []
+        return list(self.do_run())
 
     def get_chef_hosts(self):
         def get_public_ip(chef_node):
@@ -101,6 +109,9 @@ class NonChefPlugin:
                 'operating_system_version': chef_node.get('os_version'),
             }
 
+        if not self.api:
+            return
+
         # NOTE! an instance has 3 hours to register itself to chef!
         aws_to_chef_delay = 3 * 60 * 60 * 1000
         since = self.edda_client._since or 0
@@ -115,7 +126,7 @@ class NonChefPlugin:
             return
 
         # handle EC2 instances first
-        ec2_instances = self.edda_client.soft_clean().query("/api/v2/view/instances;_expand")
+        ec2_instances = self.edda_client.soft_clean().iter_query("/api/v2/view/instances;_expand")
         for machine in ec2_instances:
             enriched_instance = self.instance_enricher.report(machine)
 
@@ -2,6 +2,7 @@
 
 
 class ElasticLoadBalancerPlugin:
+    incremental = True
 
     def __init__(self):
         self.plugin_name = 'elbs'
@@ -12,6 +13,13 @@ class ElasticLoadBalancerPlugin:
         self.config = config
         self.allowed_elb_ports = config["allowed_ports"] if "allowed_ports" in config else []
 
+    def edda_queries(self, edda_client, config):
+        return [(edda_client.updateonly(), "/api/v2/aws/loadBalancers;_expand")]
+
+    def edda_fields(self, config):
+        return {"/api/v2/aws/loadBalancers;_expand": ["loadBalancerName", "canonicalHostedZoneName",
+                                                       "instances.instanceId", "listenerDescriptions"]}
+
     def run(self):
         return list(self.do_run())
 
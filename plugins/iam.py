@@ -1,13 +1,21 @@
 #!/usr/bin/env python
+import logging
 import re
 import pprint
+from multiprocessing.pool import ThreadPool
+
 from api.eddaclient import EddaException
 
 
 class UserAddedPlugin:
+    incremental = True
+    PROCESSING_POOL_SIZE = 8
+    # the revisions of a user compared in a run, like the former ;_diff=200
+    MAX_REVISIONS = 200
 
     def __init__(self):
         self.plugin_name = 'iam'
+        self.logger = logging.getLogger(self.plugin_name)
 
     def init(self, edda_client, config, status):
         self.edda_client = edda_client
@@ -19,6 +27,9 @@ class UserAddedPlugin:
     def init_allowed_list_cache(self):
         return list(re.compile(allowed) for allowed in self.config['allowed']) if 'allowed' in self.config else []
 
+    def edda_queries(self, edda_client, config):
+        return [(edda_client.updateonly(), "/api/v2/aws/iamUsers")]
+
     def run(self):
         return list(self.do_run())
 
@@ -26,44 +37,46 @@ class UserAddedPlugin:
         users = self.edda_client.updateonly().query("/api/v2/aws/iamUsers")
         # a user might have changed several times, but
         # we want to look them up only once
-        modifed_users = list(set(users))
+        modified_users = sorted(username for username in set(users)
+                                if not any(regex.match(username) for regex in self.allowed))
+        if not modified_users:
+            return
 
-        for username in modifed_users:
-            # skip allowed users
-            if any(regex.match(username) for regex in self.allowed):
-                continue
-            details = []
-            try:
-                diff = self.edda_client.raw_query("/api/v2/aws/iamUsers/%s;_diff=200" % username)
-                # find group changes in diff
-                m = re.findall(r'"groups" : \[([^\]]+)\]', diff)
-                if m:
-                    added = []
-                    removed = []
-                    for match in m:
-                        for group in match.strip().split('\n'):
-                            stripped = group[1:].strip(' ",')
-                            if stripped and group[0] == '+':
-                                added.append(stripped)
-                            elif stripped and group[0] == '-':
-                                removed.append(stripped)
-                    if added:
-                        # alert on group addon
-                        details.append('Groups the user has been added to: %s' % ', '.join(added))
-            except EddaException as e:
-                # print repr(e)
-                if e.response['code'] == 400 and e.response['message'] == '_diff requires at least 2 documents, only 1 found':
-                    print 'Got error 400, don\'t worry, we\'re fetching user detail without diffing then.'
-                    user_object = self.pp.pformat(
-                        self.edda_client.updateonly().query("/api/v2/aws/iamUsers/%s" % username))
-                    # alert on user addon
-                    details.append('New user has been added: %s\n' % user_object)
-#            except Exception as e:
-#                print 'Got unexpected exception: ', repr(e)
+        pool_size = self.config.get('threads', self.PROCESSING_POOL_SIZE)
+        self.logger.info("fetching %d users on %d threads" % (len(modified_users), pool_size))
+        processing_pool = ThreadPool(max(1, min(pool_size, len(modified_users))))
+        try:
+            checked = processing_pool.map(self.check_user, modified_users)
+        finally:
+            processing_pool.close()
 
+        for username, details in checked:
             if details:
                 yield {
                     "plugin_name": self.plugin_name,
                     "id": username,
                     "details": details
                 }
+
+    def check_user(self, username):
+        try:
+            # the revisions of the time window (and the one before it), the most recent first
+            revisions = self.edda_client.every().query("/api/v2/aws/iamUsers/%s;_limit=%d" %
+                                                       (username, self.MAX_REVISIONS))
+        except (EddaException, IOError, ValueError):
+            # EDDA errors, HTTP and network errors (urllib2, socket and requests errors are IOErrors), invalid JSON:
+            # the other users are still checked
+            self.logger.exception("Failed to fetch the revisions of user %s", username)
+            return username, []
+        if len(revisions) == 1:
+            # alert on user addon
+            return username, ['New user has been added: %s\n' % self.pp.pformat(revisions[0])]
+
+        added = []
+        for newer, older in zip(revisions, revisions[1:]):
+            old_groups = set(older.get('groups', []))
+            added.extend(group for group in newer.get('groups', []) if group not in old_groups and group not in added)
+        if added:
+            # alert on group addon
+            return username, ['Groups the user has been added to: %s' % ', '.join(added)]
+        return username, []
@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 import itertools
-from api import instance_report
+from api import ENRICHED_INSTANCE_FIELDS
 
 
 IGNORE_TAGS = ['testapp']
 
 
 class NewInstanceTagPlugin:
+    incremental = True
+
     def __init__(self):
         self.plugin_name = 'newtag'
 
@@ -16,11 +18,17 @@ class NewInstanceTagPlugin:
         self.config = config
         self.instance_enricher = instance_enricher
 
+    def edda_queries(self, edda_client, config):
+        return [(edda_client.clean(), "/api/v2/view/instances;_expand")]
+
+    def edda_fields(self, config):
+        return {"/api/v2/view/instances;_expand": ENRICHED_INSTANCE_FIELDS}
+
     def run(self):
         return list(self.do_run())
 
     def do_run(self):
-        machines = self.edda_client.clean().query("/api/v2/view/instances;_expand")
+        machines = self.edda_client.clean().iter_query("/api/v2/view/instances;_expand")
         since = self.edda_client._since if self.edda_client._since is not None else 0
         tags = [{"tag": t["value"], "started": int(m["launchTime"]), "machine": m}
                 for m in machines
@@ -38,6 +46,8 @@ class NewInstanceTagPlugin:
 
 
 class MissingInstanceTagPlugin:
+    incremental = True
+
     def __init__(self):
         self.plugin_name = 'missingtag'
 
@@ -47,11 +57,17 @@ class MissingInstanceTagPlugin:
         self.config = config
         self.instance_enricher = instance_enricher
 
+    def edda_queries(self, edda_client, config):
+        return [(edda_client.clean(), "/api/v2/view/instances;_expand")]
+
+    def edda_fields(self, config):
+        return {"/api/v2/view/instances;_expand": ENRICHED_INSTANCE_FIELDS}
+
     def run(self):
         return list(self.do_run())
 
     def do_run(self):
-        machines = self.edda_client.clean().query("/api/v2/view/instances;_expand")
+        machines = self.edda_client.clean().iter_query("/api/v2/view/instances;_expand")
         since = self.edda_client._since if self.edda_client._since is not None else 0
         suspicious_machines = [m for m in machines if self.is_suspicious(m, since)]
         for machine in suspicious_machines:
@@ -59,7 +75,7 @@ class MissingInstanceTagPlugin:
             yield {
                 "plugin_name": self.plugin_name,
                 "id": machine.get("service_type", machine.get("instanceId")),
-                "details": [instance_report(machine)]
+                "details": [self.instance_enricher.report(machine)]
             }
 
     def is_suspicious(self, machine, since):
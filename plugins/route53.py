@@ -6,7 +6,7 @@ import hashlib
 import logging
 import re
 import urllib2
-from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 
 from IPy import IP
 from chef import ChefAPI
@@ -42,9 +42,25 @@ def is_ip_private(ip_addr):
         return False
 
 
-def load_route53_entries(edda_client, zone=None):
+def route53_uri(zone=None):
     zone_selector = ";zone.name=%s" % zone if zone else ""
-    route53_entries_raw = edda_client.clean().query("/api/v2/aws/hostedRecords%s;_expand" % zone_selector)
+    return "/api/v2/aws/hostedRecords%s;_expand" % zone_selector
+
+
+def route53_edda_queries(edda_client, config):
+    return [(edda_client.clean(), route53_uri(config.get("zone"))),
+            (edda_client.soft_clean(), "/api/v2/view/instances;_expand")]
+
+
+def route53_edda_fields(config):
+    return {
+        route53_uri(config.get("zone")): ["name", "type", "resourceRecords.value"],
+        "/api/v2/view/instances;_expand": ["publicIpAddress"]
+    }
+
+
+def load_route53_entries(edda_client, zone=None):
+    route53_entries_raw = edda_client.clean().query(route53_uri(zone))
     route53_entries_dict = {e.get("name"): e for e in route53_entries_raw}  # make it distinct
     return route53_entries_dict.values()
 
@@ -60,7 +76,13 @@ def page_process_for_route53changed(location):
     try:
         if location.endswith("."):
             location = location[:-1]
-        page_content = urllib2.urlopen(location, timeout=3).read()
+        try:
+            page_content = urllib2.urlopen(location, timeout=3).read()
+        except urllib2.HTTPError as e:
+            # the content of 400 responses is checked too
+            if e.code != 400:
+                raise
+            page_content = e.read()
         page_top = page_content[255:512]
         if len(page_content) <= 255:
             page_top = page_content
@@ -94,6 +116,12 @@ class Route53Unknown:
             self.logger.exception('Failed to open config file: %s', self.config['client_key_file'])
             return None
 
+    def edda_queries(self, edda_client, config):
+        return route53_edda_queries(edda_client, config)
+
+    def edda_fields(self, config):
+        return route53_edda_fields(config)
+
     def _initialize_status(self):
         if 'known' not in self.status:
             self.status['known'] = []
@@ -113,7 +141,8 @@ class Route53Unknown:
                     continue
                 if is_ip_unknown(r, registered_ips) and is_cname_unknown(r, registered_ips, legit_domains):
                     alerts.append((e.get("name", "<unknown>"), r))
-        alerts_filtered = [a for a in alerts if ("%s-%s" % a) not in self.status['known']]
+        known = set(self.status['known'])
+        alerts_filtered = [a for a in alerts if ("%s-%s" % a) not in known]
         self.status['known'] = ["%s-%s" % a for a in alerts]
         for a in alerts_filtered:
             yield {
@@ -154,6 +183,12 @@ class Route53Changed:
         self.status = status
         self._initialize_status()
 
+    def edda_queries(self, edda_client, config):
+        return route53_edda_queries(edda_client, config)
+
+    def edda_fields(self, config):
+        return route53_edda_fields(config)
+
     def _initialize_status(self):
         if 'hashes' not in self.status:
             self.status['hashes'] = {}
@@ -171,7 +206,10 @@ class Route53Changed:
         locations_https = ["https://%s" % name for name in not_aws.keys()]
         locations = list(locations_http + locations_https)
         self.logger.info("fetching %d urls on 16 threads" % len(locations))
-        hashed_items = Pool(16).map(page_process_for_route53changed, locations)
+        # threads, not processes: forking is not safe while other plugins run on worker threads
+        processing_pool = ThreadPool(16)
+        hashed_items = processing_pool.map(page_process_for_route53changed, locations)
+        processing_pool.close()
         hashes = dict(hashed_items)
         old_hashes = self.status.get("hashes", {})
 
@@ -16,6 +16,8 @@ if not boto.config.has_section('Boto'):
 
 
 class S3AclPlugin:
+    incremental = True
+
     def __init__(self):
         self.plugin_name = 's3acl'
         self.logger = logging.getLogger('s3acl')
@@ -35,8 +37,11 @@ class S3AclPlugin:
     def init_cache_from_list_in_config(self, cache_name):
         return list(re.compile(rule_item) for rule_item in self.config[cache_name]) if cache_name in self.config else []
 
+    def edda_queries(self, edda_client, config):
+        return []
+
     def run(self):
-        return list(self.do_run(self.conn))
+        return list(self.do_run())
 
     def get_region_aware_buckets(self, buckets):
         for bucket in buckets:
@@ -56,7 +61,8 @@ class S3AclPlugin:
                 if e.status != 404:
                     self.logger.exception("Failed to get bucket location for %s", bucket.name)
 
-    def do_run(self, conn):
+    def do_run(self, conn=None):
+        conn = conn or self.conn
         buckets = list(self.filter_excluded_buckets(self.get_region_aware_buckets(conn.get_all_buckets())))
 
         for b in self.sample_population(buckets):
@@ -1,21 +1,36 @@
 #!/usr/bin/env python
 
-import socket
+import fnmatch
+import re
 import string
 from netaddr import IPNetwork, AddrFormatError
 
+from api import portprober
+from api.cidrmatcher import CIDRMatcher
+
+# "<group id> (<group name>)", the key of whitelisted_entries
+WHITELIST_ENTRY_NAME = re.compile(r'^(\S+) \((.*)\)$')
+WILDCARDS = re.compile(r'[*?\[]')
+
 
 class SecurityGroupPlugin:
+    incremental = True
+
     def __init__(self):
         self.plugin_name = 'secgroups'
         self.allowed_protocols = ["icmp"]
         self.allowed_ports = []
         self.whitelisted_ips = []
         self.whitelisted_entries = {}
+        self.whitelist = CIDRMatcher(self.whitelisted_ips)
+        self.compiled_entries = None
+        self.port_probe = {"threads": 32, "per_host": 4, "timeout": 3, "ttl": 3600, "max_hosts": 5,
+                           "max_cached": 10000}
 
     def init(self, edda_client, config, status):
         self.edda_client = edda_client
         self.status = status
+        self.port_probe = dict(self.port_probe, **config.get("port_probe", {}))
         if "allowed_protocols" in config:
             self.allowed_protocols = config["allowed_protocols"]
         if "allowed_ports" in config:
@@ -32,34 +47,88 @@ class SecurityGroupPlugin:
             except AddrFormatError:
                 pass
 
+    def edda_queries(self, edda_client, config):
+        return [(edda_client.updateonly(), "/api/v2/aws/securityGroups;_expand"),
+                (edda_client, "/api/v2/view/instances;_expand")]
+
+    def edda_fields(self, config):
+        return {
+            "/api/v2/aws/securityGroups;_expand": ["groupId", "groupName", "ownerId", "ipPermissions"],
+            "/api/v2/view/instances;_expand": ["instanceId", "publicIpAddress", "privateIpAddress", "tags.value",
+                                               "securityGroups.groupId", "placement.availabilityZone"]
+        }
+
     def run(self):
         return list(self.do_run())
 
     def do_run(self):
-        groups = self.edda_client.updateonly().query("/api/v2/aws/securityGroups;_expand")
-        machines = self.edda_client.query("/api/v2/view/instances;_expand")
+        groups = self.edda_client.updateonly().iter_query("/api/v2/aws/securityGroups;_expand")
+        machines = self.edda_client.iter_query("/api/v2/view/instances;_expand")
+        flagged = []
         for security_group in groups:
             perms = list(self.suspicious_perms(security_group))
             if perms:
-                yield {
-                    "plugin_name": self.plugin_name,
-                    "id": '%s (%s)' % (security_group["groupId"], security_group["groupName"]),
-                    "details": list(self.create_details(perms, machines, security_group))
-                }
+                flagged.append((security_group, perms))
+        if not flagged:
+            return
+
+        machines_by_group = self.machines_by_group(machines)
+        open_ports = self.probe_ports(flagged, machines_by_group)
+        for security_group, perms in flagged:
+            yield {
+                "plugin_name": self.plugin_name,
+                "id": '%s (%s)' % (security_group["groupId"], security_group["groupName"]),
+                "details": list(self.create_details(perms, machines_by_group, security_group, open_ports))
+            }
 
-    def machines_with_group(self, machines, groupId):
-        return [machine for machine in machines if self.machine_in_group(machine, groupId)]
+    def machines_by_group(self, machines):
+        # groupId -> machines in the group, built once instead of scanning every machine for each group
+        index = {}
+        for machine in machines:
+            for group_id in set(sg["groupId"] for sg in machine.get("securityGroups") or []):
+                index.setdefault(group_id, []).append(machine)
+        return index
 
-    def machine_in_group(self, machine, groupId):
-        return "securityGroups" in machine and any([sg["groupId"] == groupId for sg in machine["securityGroups"]])
+    def compile_whitelisted_entries(self, entries):
+        # entries without wildcards are indexed by group id, the others are matched against the entry name
+        by_group_id = {}
+        patterns = []
+        for entry_name, ports in entries.iteritems():
+            compiled_ports = {str(port): frozenset([ip_ranges] if isinstance(ip_ranges, basestring) else ip_ranges)
+                              for port, ip_ranges in ports.iteritems()}
+            match = WHITELIST_ENTRY_NAME.match(entry_name)
+            if match and not WILDCARDS.search(entry_name):
+                by_group_id.setdefault(match.group(1), {})[entry_name] = compiled_ports
+            else:
+                patterns.append((re.compile(fnmatch.translate(entry_name)), compiled_ports))
+        return {"entries": entries, "by_group_id": by_group_id, "patterns": patterns, "groups": {}}
+
+    def whitelisted_ports(self, security_group):
+        # port -> whitelisted ip ranges of the group, merged from every matching entry
+        if self.compiled_entries is None or self.compiled_entries["entries"] is not self.whitelisted_entries:
+            # compiled again when the entries are replaced
+            self.compiled_entries = self.compile_whitelisted_entries(self.whitelisted_entries)
+        group_key = (security_group["groupId"], security_group["groupName"])
+        groups = self.compiled_entries["groups"]
+        if group_key not in groups:
+            entry_name = '{sg_id} ({sg_name})'.format(sg_id=group_key[0], sg_name=group_key[1])
+            matching = [ports for pattern, ports in self.compiled_entries["patterns"] if pattern.match(entry_name)]
+            exact = self.compiled_entries["by_group_id"].get(group_key[0], {}).get(entry_name)
+            merged = {}
+            for ports in ([exact] if exact else []) + matching:
+                for port, ip_ranges in ports.iteritems():
+                    merged[port] = merged.get(port, frozenset()) | ip_ranges
+            groups[group_key] = merged
+        return groups[group_key]
 
     def is_whitelisted_perm(self, security_group, perm):
+        whitelisted_ports = self.whitelisted_ports(security_group)
+        if not whitelisted_ports:
+            return False
         port = str(perm["fromPort"]) if perm["fromPort"] == perm["toPort"] else '{fromPort}-{toPort}'.format(
             fromPort=perm["fromPort"], toPort=perm["toPort"])
-        entry_name = '{sg_id} ({sg_name})'.format(sg_id=security_group["groupId"], sg_name=security_group["groupName"])
-        whitelisted_ip_ranges = self.whitelisted_entries.get(entry_name, {}).get(port, [])
-        return bool(whitelisted_ip_ranges and all(
-            [actual_ip_range in whitelisted_ip_ranges for actual_ip_range in perm.get("ipRanges", [])]))
+        whitelisted_ip_ranges = whitelisted_ports.get(port, frozenset()) | whitelisted_ports.get("*", frozenset())
+        return bool(whitelisted_ip_ranges and whitelisted_ip_ranges.issuperset(perm.get("ipRanges", [])))
 
     def suspicious_perms(self, security_group):
         perms = security_group.get("ipPermissions", [])
@@ -68,7 +137,10 @@ class SecurityGroupPlugin:
                 yield perm
 
     def is_suspicious_ip_range(self, ip_range):
-        return not any([IPNetwork(ip_range) in allowed_range for allowed_range in self.whitelisted_ips])
+        if self.whitelist.networks is not self.whitelisted_ips:
+            # compiled again when the whitelist is replaced
+            self.whitelist = CIDRMatcher(self.whitelisted_ips)
+        return ip_range not in self.whitelist
 
     def is_suspicious_permission(self, perm):
         # fromPort and toPort defines a range for incoming connections
@@ -83,19 +155,50 @@ class SecurityGroupPlugin:
             return f != t or f not in self.allowed_ports
         return False
 
-    def create_details(self, perms, machines, group):
-        affected_machines = self.machines_with_group(machines, group["groupId"])
+    def probe_ports(self, flagged, machines_by_group):
+        """
+        Returns (group id, fromPort, toPort) -> whether the port range of the permission is open on a machine of
+        the group, None if it is too wide to probe. Up to max_hosts machines of a group are probed, until one of
+        them answers.
+        """
+        open_ports = {}
+        target_groups = {}
+        for security_group, perms in flagged:
+            hosts = self.machine_addresses(machines_by_group.get(security_group["groupId"], []))
+            hosts = hosts[:self.port_probe["max_hosts"]]
+            for perm in perms:
+                key = (security_group["groupId"], perm['fromPort'], perm['toPort'])
+                ports = self.ports_to_probe(perm['fromPort'], perm['toPort'])
+                if hosts and ports is None:
+                    open_ports[key] = None
+                else:
+                    target_groups[key] = tuple((host, port) for host in hosts for port in ports)
+        prober = portprober.PortProber(lambda host, port: self.is_port_open(host, port, port),
+                                       self.status.setdefault("port_probes", {}), self.port_probe["ttl"],
+                                       self.port_probe["threads"], self.port_probe["per_host"],
+                                       self.port_probe["max_cached"])
+        verdicts = prober.probe_any(target_groups.values())
+        open_ports.update((key, verdicts[targets]) for key, targets in target_groups.iteritems())
+        return open_ports
+
+    def machine_addresses(self, machines):
+        return [address for address in (m["publicIpAddress"] or m["privateIpAddress"] for m in machines) if address]
+
+    def create_details(self, perms, machines_by_group, group, open_ports):
+        affected_machines = machines_by_group.get(group["groupId"], [])
         aws_availability_zone = '' if not affected_machines else affected_machines[0]['placement']['availabilityZone']
         aws_region = aws_availability_zone.rstrip(string.ascii_lowercase)
         aws_account = group['ownerId']
+        mproc = [(m["instanceId"], m["publicIpAddress"] or m["privateIpAddress"],
+                  ",".join([t["value"] for t in m["tags"]]))
+                 for m in affected_machines]
+        ip_addresses = [m[1] for m in mproc if m[1]]
+        machine_names = ["%s (%s): %s" % m for m in mproc]
         for perm in perms:
-            mproc = [(m["instanceId"], m["publicIpAddress"] or m["privateIpAddress"],
-                      ",".join([t["value"] for t in m["tags"]]))
-                     for m in affected_machines]
             yield {
-                'port_open': len(mproc) > 0 and self.is_port_open(mproc[0][1], perm['fromPort'], perm['toPort']),
-                'ipAddresses': [m[1] for m in mproc if m[1]],
-                'machines': ["%s (%s): %s" % m for m in mproc],
+                'port_open': open_ports[(group["groupId"], perm['fromPort'], perm['toPort'])],
+                'ipAddresses': list(ip_addresses),
+                'machines': list(machine_names),
                 'fromPort': perm['fromPort'],
                 'ipRanges': perm['ipRanges'],
                 'toPort': perm['toPort'],
@@ -104,20 +207,16 @@ class SecurityGroupPlugin:
                 'awsAccount': aws_account
             }
 
-    def is_port_open(self, host, port_from, port_to):
-        if host and port_to and port_from and 0 <= port_to <= 65535 and 0 <= port_from <= 65535:
+    def ports_to_probe(self, port_from, port_to):
+        # None if the range is too wide to probe, empty if it is not valid
+        if port_to and port_from and 0 <= port_to <= 65535 and 0 <= port_from <= 65535:
             if abs(port_to - port_from) > 20:
                 return None
-            for port_to_check in range(int(port_from), int(port_to) + 1):
-                try:
-                    print 'connecting'
-                    # default timeout is 3 sec
-                    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    s.settimeout(3)
-                    s.connect((host, port_to_check))
-                    s.close()
-                    return True
-                except (socket.timeout, socket.error) as e:
-                    print 'got exception', e
-                    pass
-        return False
+            return range(int(port_from), int(port_to) + 1)
+        return []
+
+    def is_port_open(self, host, port_from, port_to):
+        ports = self.ports_to_probe(port_from, port_to) if host else []
+        if ports is None:
+            return None
+        return any(portprober.is_port_open(host, port, self.port_probe["timeout"]) for port in ports)
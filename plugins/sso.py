@@ -1,10 +1,10 @@
 import logging
 import urllib
-from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
 
 import re
 import requests
-from .route53 import load_route53_entries, is_external
+from .route53 import load_route53_entries, route53_edda_queries, route53_edda_fields, is_external
 
 
 def fetch_url(location):
@@ -27,6 +27,12 @@ class BaseClass:
     def __init__(self):
         pass
 
+    def edda_queries(self, edda_client, config):
+        return route53_edda_queries(edda_client, config)
+
+    def edda_fields(self, config):
+        return route53_edda_fields(config)
+
     def run(self):
         raise NotImplementedError()
 
@@ -56,7 +62,8 @@ class BaseClass:
 
         self.logger.info("fetching %d urls on %d threads" % (len(locations), self.PROCESSING_POOL_SIZE))
 
-        processing_pool = Pool(self.PROCESSING_POOL_SIZE)
+        # threads, not processes: forking is not safe while other plugins run on worker threads
+        processing_pool = ThreadPool(self.PROCESSING_POOL_SIZE)
         result = {url: resp for url, resp in processing_pool.map(fetch_url, locations) if resp}
         processing_pool.close()
         return result
@@ -133,16 +140,16 @@ class SecurityHeaders(BaseClass):
         self.edda_client = edda_client
         self.config = config
         self.status = status
-        self.already_checked = self.status.setdefault('already_checked', [])
+        self.already_checked = set(self.status.setdefault('already_checked', []))
 
     def run(self):
         for location, response in self.get_all_my_domains_response().iteritems():
             if location not in self.already_checked and \
                     not response['headers'].get('x-frame-options') and 200 <= response['code'] < 300:
-                self.already_checked.append(location)
+                self.already_checked.add(location)
                 yield {
                     "plugin_name": self.plugin_name,
                     "id": location,
                     "details": list(["This webpage (%s) does not have X-Frame-Options header" % location])
                 }
-        self.status['already_checked'] = self.already_checked
+        self.status['already_checked'] = sorted(self.already_checked)
@@ -2,6 +2,7 @@
 import json
 import time
 import calendar
+import os
 import sys
 
 from lockfile import LockFile, LockTimeout
@@ -54,6 +55,22 @@ class Reddalert:
                 logger.exception("Failed to write file '%s'", json_file)
         return False
 
+    @staticmethod
+    def load_status(status_file, logger):
+        # the status is stored in SQLite if the file has a .db or .sqlite extension, in JSON otherwise
+        from api.statusstore import SQLiteStatus, is_sqlite_status
+        if is_sqlite_status(status_file):
+            return SQLiteStatus(status_file, migrate_from=os.path.splitext(status_file)[0] + '.json')
+        return Reddalert.load_json(status_file, logger)
+
+    @staticmethod
+    def save_status(status_file, status, logger):
+        if hasattr(status, 'commit'):
+            # SQLiteStatus
+            status.commit()
+            return True
+        return Reddalert.save_json(status_file, status, logger)
+
     @staticmethod
     def get_config(key, config, arg=None, default=None):
         if arg is not None:
@@ -66,7 +83,10 @@ class Reddalert:
 if __name__ == '__main__':
     import argparse
     import logging
-    from api import EddaClient, Coordinator, Alerter
+    from api import EddaClient, Coordinator, AccountsCoordinator, Daemon, Alerter, DiskCache, HTTPTransport
+    from api import ResponseCache
+    from api.daemon import EDDA_DELAY
+    from api.profiler import NullProfiler, Profiler
     from plugins import plugin_list
 
     parser = argparse.ArgumentParser(description='Runs tests against AWS configuration')
@@ -74,14 +94,24 @@ if __name__ == '__main__':
     parser.add_argument('--statusfile', '-f', default='etc/statusfile.json', help='Persistent store between runs')
     parser.add_argument('--since', '-s', default=None,
                         help='Override statusfile, epoch in ms, Y-m-d H-M-S format or file')
-    # hack to avoid race condition within EDDA: it's possible instances are synced while eg security groups aren't.
-    parser.add_argument('--until', '-u', default=int(time.time()) * 1000 - 5 * 60 * 1000, help='Until, epoch in ms')
+    parser.add_argument('--until', '-u', default=int(time.time()) * 1000 - EDDA_DELAY * 1000, help='Until, epoch in ms')
     parser.add_argument('--store-until', action="count", help='Use file in --since to store back the until epoch')
     parser.add_argument('--edda', '-e', default=None, help='Edda base URL')
+    parser.add_argument('--cache-dir', default=None, help='Directory of the persistent EDDA response cache (optional)')
     parser.add_argument('--sentry', default=None, help='Sentry url with user:pass (optional)')
     parser.add_argument('--output', '-o', default=None,
                         help='Comma sepparated list of outputs to use (stdout,stdout_tabsep,mail_txt,mail_html,elasticsearch)')
     parser.add_argument('--silent', '-l', action="count", help='Supress log messages lower than warning')
+    parser.add_argument('--jobs', '-j', type=int, default=None, help='Number of plugins to run in parallel')
+    parser.add_argument('--daemon', '-d', action="count", help='Keep running the rules, each at its own interval')
+    parser.add_argument('--record', default=None, help='Record the responses of external services into a directory')
+    parser.add_argument('--replay', default=None, help='Replay the responses recorded into a directory')
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help='Multiplier of the recorded latencies in replay mode (0 disables waiting)')
+    parser.add_argument('--profile', default=None,
+                        help='Write the cProfile data and the sampled stacks of each plugin into a directory')
+    parser.add_argument('--profile-memory', action="count",
+                        help='Also write the top allocation sites of each plugin (needs tracemalloc)')
     parser.add_argument('rules', metavar='rule', nargs='*', default=plugin_list.keys(), help='Rules to check')
     args = parser.parse_args()
 
@@ -126,32 +156,103 @@ if __name__ == '__main__':
     config = Reddalert.load_json(args.configfile, root_logger)
 
     # Load data from previous run:
-    status = Reddalert.load_json(args.statusfile, root_logger)
+    status = Reddalert.load_status(args.statusfile, root_logger)
     since = Reddalert.get_config('since', status, Reddalert.get_since(args.since), 0)
 
+    # Record or replay the responses of EDDA, Chef, AWS and the checked web sites
+    cassette = None
+    if args.record or args.replay:
+        from api.cassette import Cassette, CassetteTransport, install
+        cassette = Cassette(args.record or args.replay, replay=bool(args.replay), latency_scale=args.latency_scale)
+        install(cassette)
+        if cassette.replaying:
+            # the EDDA queries of the recorded run
+            meta = cassette.load_meta()
+            since, args.until = meta['since'], meta['until']
+        else:
+            cassette.save_meta({'since': since, 'until': args.until})
+
     # Setup EDDA client
     edda_url = Reddalert.get_config('edda', config, args.edda, 'http://localhost:8080/edda')
-    edda_client = EddaClient(edda_url).since(since).until(args.until)
+    prefetch_threads = Reddalert.get_config('prefetch_threads', config, default=8)
+    transport = HTTPTransport(timeout=Reddalert.get_config('edda_timeout', config, default=60),
+                              pool_size=prefetch_threads)
+    if cassette:
+        transport = CassetteTransport(transport, cassette)
+    daemon = Reddalert.get_config('daemon', config, args.daemon, False)
+    response_cache = ResponseCache(Reddalert.get_config('edda_memory_cache_bytes', config),
+                                   Reddalert.get_config('edda_memory_cache_ttl', config,
+                                                        default=300 if daemon else None))
+    edda_client = EddaClient(edda_url).with_transport(transport)
+    edda_client = edda_client.with_cache(response_cache)
+    if Reddalert.get_config('edda_local_views', config, default=False):
+        edda_client = edda_client.with_local_views()
+    cache_config = Reddalert.get_config('edda_cache', config, default={})
+    cache_dir = Reddalert.get_config('directory', cache_config, args.cache_dir)
+    if cache_dir:
+        disk_cache = DiskCache(cache_dir, cache_config.get('ttl'), cache_config.get('max_bytes'))
+        edda_client = edda_client.with_disk_cache(disk_cache)
 
     # Setup the alerter
     output_targets = Reddalert.get_config('output', config, args.output, 'stdout')
     alerter = Alerter(output_targets)
 
-    # Setup the Coordinator
-    coordinator = Coordinator(edda_client, alerter, config, status)
+    plugins = [plugin_list[rn] for rn in args.rules if rn in plugin_list]
+    jobs = Reddalert.get_config('jobs', config, args.jobs, 1)
+
+    profiler = NullProfiler()
+    if args.profile:
+        profiler = Profiler(args.profile, memory=bool(args.profile_memory))
+        if profiler.memory and jobs > 1:
+            root_logger.warning("Running the plugins one by one, the memory profiles cover the whole process")
+            jobs = 1
+
+    accounts = Reddalert.get_config('accounts', config, default={})
+    if accounts and daemon:
+        root_logger.critical('Multiple accounts are not supported in daemon mode... exiting.')
+        sys.exit(1)
+
+    if daemon:
+        def save_status(status, metrics):
+            Reddalert.save_status(args.statusfile, status, root_logger)
+            metrics.write(args.statusfile)
+
+        # The lock is held while the daemon is running
+        status['since'] = since
+        Daemon(edda_client, alerter, config, status, plugins, save_status, prefetch_threads, jobs,
+               Reddalert.get_config('daemon_tick', config, default=60),
+               Reddalert.get_config('daemon_interval', config, default=3600), profiler).run_forever()
+        root_logger.info("Reddalert daemon stopped.")
+        if RemoveLockProcessor.lock_file:
+            RemoveLockProcessor.lock_file.release()
+        sys.exit()
+
+    # Setup the Coordinator, one per account if there are several
+    edda_client = edda_client.since(since).until(args.until)
+    if accounts:
+        coordinator = AccountsCoordinator([(name, edda_client.clone_modify({'_edda_url': account['edda']}))
+                                           for name, account in sorted(accounts.iteritems())],
+                                          alerter, config, status, profiler)
+    else:
+        coordinator = Coordinator(edda_client, alerter, config, status, profiler=profiler)
+
+    # Fetch EDDA data needed by the selected plugins in parallel
+    coordinator.prefetch(plugins, prefetch_threads)
 
     # Run checks
-    for plugin in [plugin_list[rn] for rn in args.rules if rn in plugin_list]:
-        root_logger.info('run_plugin: %s', plugin.plugin_name)
-        coordinator.run(plugin)
+    coordinator.run_all(plugins, jobs)
+
+    coordinator.log_cache_stats()
 
     # Send alerts
-    alerter.send_alerts(config)
+    with profiler.profile('send_alerts'):
+        alerter.send_alerts(config)
 
     # Save results
     if Reddalert.get_config('store-until', config, args.output, False):
         status['since'] = args.until
-    Reddalert.save_json(args.statusfile, status, root_logger)
+    Reddalert.save_status(args.statusfile, status, root_logger)
+    coordinator.metrics.write(args.statusfile)
 
     root_logger.info("Reddalert finished successfully.")
     if RemoveLockProcessor.lock_file:
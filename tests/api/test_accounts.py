@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+import unittest
+from mock import patch, Mock
+
+from api.accounts import AccountsCoordinator, AccountStatus, account_config
+from api.alerter import Alerter
+from api.eddaclient import EddaClient
+
+
+class CountingPlugin:
+    plugin_name = 'counting'
+
+    def init(self, edda_client, config, status):
+        self.edda_client = edda_client
+        self.config = config
+        self.status = status
+
+    def edda_queries(self, edda_client, config):
+        return [(edda_client, '/api/v2/aws/iamUsers')]
+
+    def run(self):
+        users = self.edda_client.query('/api/v2/aws/iamUsers')
+        self.status['runs'] = self.status.get('runs', 0) + 1
+        return [{'plugin_name': self.plugin_name, 'id': user, 'details': [self.config['level']]} for user in users]
+
+
+class OptionPlugin:
+    plugin_name = 'option'
+
+    def __init__(self):
+        self.level = 'default'
+
+    def init(self, edda_client, config, status):
+        if 'level' in config:
+            self.level = config['level']
+
+    def edda_queries(self, edda_client, config):
+        return []
+
+    def run(self):
+        return [{'plugin_name': self.plugin_name, 'id': 'level', 'details': [self.level]}]
+
+
+class AccountsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {
+            'output': 'stdout',
+            'plugin.counting': {'level': 'low', 'other': 1},
+            'accounts': {
+                'prod': {'edda': 'http://edda-prod/edda', 'plugin.counting': {'level': 'high'}},
+                'staging': {'edda': 'http://edda-staging/edda', 'output': 'mail_txt'}
+            }
+        }
+
+    def test_account_config(self):
+        self.assertEqual(account_config(self.config, 'prod'), {
+            'output': 'stdout',
+            'edda': 'http://edda-prod/edda',
+            'plugin.counting': {'level': 'high', 'other': 1}
+        })
+        # the alerts of every account are sent by the same alerter
+        self.assertEqual(account_config(self.config, 'staging')['output'], 'stdout')
+        self.assertEqual(self.config['plugin.counting'], {'level': 'low', 'other': 1})
+
+    def test_account_status(self):
+        status = {'since': 1, 'account.prod.plugin.ami': {'first_seen': {}}}
+        account_status = AccountStatus(status, 'prod')
+
+        self.assertEqual(list(account_status), ['plugin.ami'])
+        self.assertIn('plugin.ami', account_status)
+        account_status.setdefault('plugin.iam', {})['users'] = []
+        self.assertEqual(status['account.prod.plugin.iam'], {'users': []})
+
+        store = Mock()
+        AccountStatus(store, 'prod').commit('plugin.ami')
+        store.commit.assert_called_once_with('account.prod.plugin.ami')
+
+    @patch('api.eddaclient.EddaClient.do_query')
+    def test_run(self, do_query):
+        do_query.side_effect = lambda url: ['bob'] if url.startswith('http://edda-prod') else ['alice']
+        edda_client = EddaClient('http://edda/edda').since(1).until(2)
+        accounts = [(name, edda_client.clone_modify({'_edda_url': url}))
+                    for name, url in [('prod', 'http://edda-prod/edda'), ('staging', 'http://edda-staging/edda')]]
+        alerter = Alerter('')
+        status = {}
+
+        with patch('api.coordinator.InstanceEnricher'):
+            coordinator = AccountsCoordinator(accounts, alerter, self.config, status)
+            coordinator.prefetch([CountingPlugin()])
+            coordinator.run_all([CountingPlugin()])
+
+        self.assertItemsEqual(alerter.recorded_alerts, [('counting', 'bob', 'high', 'prod'),
+                                                        ('counting', 'alice', 'low', 'staging')])
+        self.assertEqual(status, {'account.prod.plugin.counting': {'runs': 1},
+                                  'account.staging.plugin.counting': {'runs': 1}})
+        self.assertItemsEqual(coordinator.metrics.plugins.keys(), ['prod.counting', 'staging.counting'])
+        self.assertItemsEqual([c[0][0] for c in do_query.call_args_list],
+                              ['http://edda-prod/edda/api/v2/aws/iamUsers;_since=1;_until=2',
+                               'http://edda-staging/edda/api/v2/aws/iamUsers;_since=1;_until=2'])
+
+    def test_plugin_options_per_account(self):
+        self.config['accounts']['prod']['plugin.option'] = {'level': 'high'}
+        edda_client = EddaClient('http://edda/edda')
+        alerter = Alerter('')
+
+        with patch('api.coordinator.InstanceEnricher'):
+            coordinator = AccountsCoordinator([('prod', edda_client), ('staging', edda_client)], alerter,
+                                              self.config, {})
+            coordinator.run_all([OptionPlugin()])
+
+        self.assertEqual(alerter.recorded_alerts, [('option', 'level', 'high', 'prod'),
+                                                   ('option', 'level', 'default', 'staging')])
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,7 @@ from api.alerter import Alerter
 from api.alerter import EmailAlertSender
 from api.alerter import ESAlertSender
 from api.alerter import StdOutAlertSender
+from api.instanceenricher import instance_report
 
 
 class StdOutSenderTestCase(unittest.TestCase):
@@ -28,6 +29,11 @@ class StdOutSenderTestCase(unittest.TestCase):
         self.assertIn("Alert: array2", c)
         self.assertIn("foo", c)
 
+    def test_account(self):
+        ow = StringIO.StringIO()
+        StdOutAlertSender(False, ow).send_alerts({}, [("simple", "_1_", "simple text", "prod")])
+        self.assertIn("Account: prod\nRule: simple", ow.getvalue())
+
 
 class EmailSenderTestCase(unittest.TestCase):
     def setUp(self):
@@ -119,6 +125,24 @@ class ElasticSearchWriterTestCase(unittest.TestCase):
         self.assertIn("rule", flat_alerts[0])
         self.assertEquals("_3_", flat_alerts[0]["id"])
 
+    def test_account(self):
+        esa = ESAlertSender()
+
+        flat_alerts = list(esa.flatten_alerts([("complex", "_3_", {"foo": "bar"}, "prod"),
+                                               ("complex", "_4_", {"awsAccount": "1234"}, "prod")]))
+
+        self.assertEquals(["prod", "1234"], [a["awsAccount"] for a in flat_alerts])
+
+    def test_account_of_instance_report(self):
+        esa = ESAlertSender()
+        # without an instance profile, the report has no account id
+        report = instance_report({"instanceId": "i-1", "tags": []})
+
+        flat_alerts = list(esa.flatten_alerts([("newtag", "i-1", report, "prod")]))
+
+        self.assertIsNone(report["awsAccount"])
+        self.assertEquals("prod", flat_alerts[0]["awsAccount"])
+
     def test_leave_simple_details(self):
         esa = ESAlertSender()
 
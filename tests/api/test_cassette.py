@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+import shutil
+import tempfile
+import unittest
+import urllib2
+from mock import patch, Mock
+
+import boto.connection
+import chef
+from boto.exception import S3ResponseError
+from chef.exceptions import ChefServerNotFoundError
+import plugins.route53
+import plugins.sso
+from api.cassette import Cassette, CassetteMiss, CassetteTransport, install
+
+
+class CassetteTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.recorder = Cassette(self.directory)
+        self.player = Cassette(self.directory, replay=True, latency_scale=0.5)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @patch('api.cassette.time.sleep')
+    @patch('api.cassette.time.time', side_effect=[100, 102] + [102] * 5)
+    def test_record_and_replay(self, now, sleep):
+        self.assertEqual(self.recorder.call('http', 'http://foo', lambda: {'code': 200}), {'code': 200})
+        self.assertEqual(self.player.call('http', 'http://foo', Mock()), {'code': 200})
+        sleep.assert_called_once_with(1.0)
+
+    def test_errors(self):
+        errors = [urllib2.HTTPError('http://edda/api', 502, 'Bad Gateway', {}, None),
+                  ChefServerNotFoundError('node not found', 404),
+                  S3ResponseError(403, 'Forbidden', '<Error/>')]
+        for i, error in enumerate(errors):
+            self.assertRaises(error.__class__, self.recorder.call, 'http', str(i), Mock(side_effect=error))
+
+        replayed = []
+        for i, error in enumerate(errors):
+            with self.assertRaises(error.__class__) as raised:
+                self.player.call('http', str(i), Mock())
+            replayed.append(raised.exception)
+
+        self.assertEqual([replayed[0].code, str(replayed[0])], [502, 'HTTP Error 502: Bad Gateway'])
+        self.assertEqual([replayed[1].code, str(replayed[1])], [404, 'node not found'])
+        self.assertEqual([replayed[2].status, replayed[2].reason], [403, 'Forbidden'])
+
+    def test_miss(self):
+        self.assertRaises(CassetteMiss, self.player.call, 'http', 'http://foo', Mock())
+
+    def test_meta(self):
+        self.recorder.save_meta({'since': 1, 'until': 2})
+        self.assertEqual(self.player.load_meta(), {'since': 1, 'until': 2})
+
+    def test_transport(self):
+        transport = Mock()
+        transport.iter_content.return_value = iter(['[1, ', '2]\xff'])
+        transport.read.return_value = (400, '{"code": 400}')
+
+        recording = CassetteTransport(transport, self.recorder)
+        self.assertEqual(''.join(recording.iter_content('http://edda/a', 3)), '[1, 2]\xff')
+        self.assertEqual(recording.read('http://edda/b'), (400, '{"code": 400}'))
+
+        replaying = CassetteTransport(Mock(), Cassette(self.directory, replay=True, latency_scale=0))
+        self.assertEqual(list(replaying.iter_content('http://edda/a', 3)), ['[1,', ' 2]', '\xff'])
+        self.assertEqual(replaying.read('http://edda/b'), (400, '{"code": 400}'))
+
+
+class InstallTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.originals = [(chef.ChefAPI, '__init__'), (chef.ChefAPI, 'request'),
+                          (boto.connection.AWSAuthConnection, 'make_request'),
+                          (plugins.sso, 'fetch_url'), (plugins.route53, 'page_process_for_route53changed')]
+        self.originals = [(owner, name, owner.__dict__[name]) for owner, name in self.originals]
+
+    def tearDown(self):
+        for owner, name, original in self.originals:
+            setattr(owner, name, original)
+        shutil.rmtree(self.directory)
+
+    def test_hooks(self):
+        chef.ChefAPI.request = Mock(return_value='{"rows": []}')
+        plugins.sso.fetch_url = Mock(return_value=('http://foo', {'code': 302, 'headers': {'Location': 'https://foo'}}))
+        response = Mock(status=200, reason='OK', getheaders=Mock(return_value=[('ETag', 'x')]),
+                        read=Mock(return_value='<xml/>'))
+        boto.connection.AWSAuthConnection.make_request = Mock(return_value=response)
+
+        install(Cassette(self.directory))
+        api = object.__new__(chef.ChefAPI)
+        self.assertEqual(api.request('POST', '/search/node', data='{}'), '{"rows": []}')
+        plugins.sso.fetch_url('http://foo')
+        connection = object.__new__(boto.connection.AWSAuthConnection)
+        connection.host = 's3.amazonaws.com'
+        connection.make_request('GET', '/bucket')
+
+        for owner, name, original in self.originals:
+            setattr(owner, name, original)
+        install(Cassette(self.directory, replay=True, latency_scale=0))
+
+        api = chef.ChefAPI('https://chef', '/no/such/key.pem', 'client')
+        self.assertEqual(api.request('POST', '/search/node', data='{}'), '{"rows": []}')
+        location, fetched = plugins.sso.fetch_url('http://foo')
+        self.assertEqual(fetched['headers'].get('location'), 'https://foo')
+        aws_response = connection.make_request('GET', '/bucket')
+        self.assertEqual((aws_response.status, aws_response.read(), aws_response.getheader('etag')),
+                         (200, '<xml/>', 'x'))
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+import unittest
+from mock import patch
+
+from netaddr import IPNetwork, AddrFormatError
+
+from api.cidrmatcher import CIDRMatcher
+
+
+class CIDRMatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.networks = [IPNetwork(network) for network in
+                         ['1.2.3.4/24', '2.2.2.2/32', '172.16.0.0/12', '2001:db8::/32', '10.0.0.0/8']]
+        self.matcher = CIDRMatcher(self.networks)
+
+    def test_contains(self):
+        for ip_range in ['1.2.3.0/24', '1.2.3.128/25', '2.2.2.2/32', '2.2.2.2', '172.31.255.0/24', '10.1.2.3/32',
+                         '2001:db8:1::/48', '0.0.0.0/0', '172.16.0.0/0', '2.2.2.0/24', '1.2.0.0/16', '3.3.3.3/32',
+                         '::/0', '2001:db9::/32', '::ffff:10.0.0.1/128']:
+            expected = any(IPNetwork(ip_range) in network for network in self.networks)
+            self.assertEqual(ip_range in self.matcher, expected, ip_range)
+
+    def test_memoized(self):
+        with patch.object(self.matcher, 'contains_network', wraps=self.matcher.contains_network) as contains:
+            self.assertFalse('0.0.0.0/0' in self.matcher)
+            self.assertFalse('0.0.0.0/0' in self.matcher)
+            self.assertTrue('1.2.3.0/24' in self.matcher)
+        self.assertEqual(contains.call_count, 2)
+
+    def test_empty(self):
+        self.assertFalse('0.0.0.0/0' in CIDRMatcher([]))
+
+    def test_invalid(self):
+        self.assertRaises(AddrFormatError, self.matcher.__contains__, 'not an ip')
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
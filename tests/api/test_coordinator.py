@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+import threading
+import time
+import unittest
+from mock import patch, Mock, MagicMock
+
+from api.alerter import Alerter
+from api.coordinator import Coordinator
+from api.eddaclient import EddaClient
+
+
+class SleepingPlugin:
+    def __init__(self, name):
+        self.plugin_name = name
+        self.threads = []
+
+    def init(self, edda_client, config, status):
+        self.status = status
+
+    def run(self):
+        time.sleep(0.2)
+        self.status['ran'] = True
+        self.threads.append(threading.current_thread().name)
+        return [{'plugin_name': self.plugin_name, 'id': self.plugin_name, 'details': ['alert']}]
+
+
+class SlowPlugin:
+    def __init__(self, name, delays):
+        self.plugin_name = name
+        self.delays = delays
+
+    def init(self, edda_client, config, status):
+        self.status = status
+
+    def run(self):
+        for i, delay in enumerate(self.delays):
+            time.sleep(delay)
+            self.status.setdefault('checked', []).append(i)
+            yield {'plugin_name': self.plugin_name, 'id': '%s-%d' % (self.plugin_name, i), 'details': ['alert']}
+
+
+class ListPlugin(SlowPlugin):
+    # like most plugins: run() returns the list of the alerts of do_run()
+    incremental = True
+
+    def run(self):
+        return list(self.do_run())
+
+    def do_run(self):
+        return SlowPlugin.run(self)
+
+
+class CoordinatorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.edda_client = EddaClient('http://localhost:8888/edda').since(1).until(2)
+        self.alerter = Mock()
+        self.coordinator = Coordinator(self.edda_client, self.alerter, {}, {})
+
+    def create_plugin(self, name, uris):
+        plugin = Mock()
+        plugin.plugin_name = name
+        plugin.edda_queries = Mock(side_effect=lambda edda_client, config: [(edda_client.updateonly(), uri)
+                                                                            for uri in uris])
+        return plugin
+
+    @patch('api.eddaclient.EddaClient.do_query', return_value=[])
+    def test_prefetch(self, do_query):
+        plugins = [self.create_plugin('foo', ['/api/v2/aws/iamUsers']),
+                   self.create_plugin('bar', ['/api/v2/aws/iamUsers', '/api/v2/view/instances;_expand'])]
+
+        self.coordinator.prefetch(plugins, 4)
+
+        fetched = sorted(c[0][0] for c in do_query.call_args_list)
+        self.assertEqual(fetched, [
+            'http://localhost:8888/edda/api/v2/aws/iamUsers;_since=1;_until=2;_updated',
+            'http://localhost:8888/edda/api/v2/aws/loadBalancers;_expand',
+            'http://localhost:8888/edda/api/v2/aws/securityGroups;_expand',
+            'http://localhost:8888/edda/api/v2/view/instances;_expand;_since=1;_until=2;_updated',
+        ])
+        self.assertTrue(self.coordinator.enricher_initialized)
+        self.assertEqual(self.coordinator.config, {'plugin.foo': {}, 'plugin.bar': {}})
+
+        # plugins are served from the shared cache
+        self.edda_client.updateonly().query('/api/v2/aws/iamUsers')
+        self.assertEqual(do_query.call_count, 4)
+
+    @patch('api.coordinator.Coordinator.initialize_enricher')
+    @patch('api.eddaclient.EddaClient.do_query', side_effect=ValueError('invalid'))
+    def test_prefetch_survives_errors(self, do_query, initialize_enricher):
+        self.coordinator.prefetch([self.create_plugin('foo', ['/api/v2/aws/iamUsers'])])
+        self.assertEqual(do_query.call_count, 3)
+        initialize_enricher.assert_called_once_with()
+
+    def test_edda_projections(self):
+        plugin1 = self.create_plugin('foo', ['/api/v2/view/instances;_expand', '/api/v2/aws/iamUsers'])
+        plugin1.edda_fields = Mock(return_value={'/api/v2/view/instances;_expand': ['instanceId', 'tags.key']})
+        plugin2 = self.create_plugin('bar', ['/api/v2/view/instances;_expand', '/api/v2/aws/loadBalancers;_expand'])
+        plugin2.edda_fields = Mock(return_value={'/api/v2/view/instances;_expand': ['instanceId', 'imageId']})
+
+        self.assertEqual(self.coordinator.edda_projections([plugin1, plugin2]), {
+            '/api/v2/view/instances;_expand': ['imageId', 'instanceId', 'tags.key'],
+            '/api/v2/aws/securityGroups;_expand': ['groupId', 'ipPermissions.ipRanges', 'ipPermissions.toPort']
+        })
+
+        plugin3 = self.create_plugin('baz', ['/api/v2/view/instances;_expand'])
+        del plugin3.edda_fields
+        self.assertNotIn('/api/v2/view/instances;_expand',
+                         self.coordinator.edda_projections([plugin1, plugin2, plugin3]))
+
+        del plugin3.edda_queries
+        self.assertEqual(self.coordinator.edda_projections([plugin1, plugin3]), {})
+
+    def test_run_all_parallel(self):
+        alerter = Alerter('')
+        coordinator = Coordinator(self.edda_client, alerter, {}, {})
+        plugins = [SleepingPlugin('p%d' % i) for i in range(4)]
+
+        start = time.time()
+        coordinator.run_all(plugins, jobs=4)
+
+        self.assertLess(time.time() - start, 0.6)
+        self.assertItemsEqual([a[0] for a in alerter.recorded_alerts], ['p0', 'p1', 'p2', 'p3'])
+        self.assertEqual(coordinator.status, {'plugin.p%d' % i: {'ran': True} for i in range(4)})
+        self.assertEqual(len(set(sum([p.threads for p in plugins], []))), 4)
+
+    def test_run_all_sequential(self):
+        coordinator = Coordinator(self.edda_client, Alerter(''), {}, {})
+        plugins = [SleepingPlugin('p%d' % i) for i in range(2)]
+
+        coordinator.run_all(plugins)
+
+        self.assertEqual([p.threads for p in plugins], [['MainThread'], ['MainThread']])
+
+    def test_run(self):
+        class Plugin:
+            plugin_name = 'foo'
+
+            def init(self, edda_client, config, status):
+                pass
+
+        plugin = Plugin()
+        plugin.run = Mock(return_value=[{'plugin_name': 'foo', 'id': 'bar', 'details': ['baz']}])
+
+        self.coordinator.run(plugin)
+
+        self.alerter.run.assert_called_once_with([{'plugin_name': 'foo', 'id': 'bar', 'details': ['baz']}])
+        self.assertFalse(self.coordinator.enricher_initialized)
+        self.assertEqual(self.coordinator.metrics.plugins['foo']['alerts'], 1)
+        self.assertEqual(self.coordinator.metrics.plugins['foo']['queries'], 0)
+
+    def test_plugin_deadline(self):
+        alerter = Alerter('')
+        config = {'plugin_timeout': 0.3, 'plugin.slow': {'timeout': 0.2}}
+        status = {'plugin.slow': {'checked': ['before']}}
+        coordinator = Coordinator(self.edda_client, alerter, config, status)
+
+        start = time.time()
+        coordinator.run_all([SlowPlugin('slow', [0, 0, 1]), SlowPlugin('fast', [0, 0.1])])
+
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(sorted(a[1] for a in alerter.recorded_alerts), ['fast-0', 'fast-1', 'slow-0', 'slow-1'])
+        self.assertEqual(status['plugin.slow'], {'checked': ['before']})
+        self.assertEqual(status['plugin.fast'], {'checked': [0, 1]})
+        self.assertEqual(coordinator.metrics.plugins['slow']['timed_out'], 1)
+        self.assertEqual(coordinator.metrics.plugins['slow']['alerts'], 2)
+        self.assertEqual(coordinator.metrics.plugins['fast']['timed_out'], 0)
+
+        # the overrunning plugin is not started again while its previous run is going on
+        coordinator.run(SlowPlugin('slow', [0]))
+        self.assertEqual(coordinator.metrics.plugins['slow']['alerts'], 0)
+        self.assertEqual(coordinator.metrics.plugins['slow']['timed_out'], 1)
+
+    def test_list_plugin_deadline(self):
+        coordinator = Coordinator(self.edda_client, Alerter(''), {'plugin_timeout': 0.3}, {})
+
+        coordinator.run(ListPlugin('listing', [0, 0, 1]))
+
+        self.assertEqual([alert[1] for alert in coordinator.alerter.recorded_alerts], ['listing-0', 'listing-1'])
+        self.assertEqual(coordinator.metrics.plugins['listing']['timed_out'], 1)
+
+    def test_not_incremental_plugin(self):
+        class CustomPlugin(ListPlugin):
+            incremental = False
+
+            def run(self):
+                return [dict(alert, id='from-run') for alert in self.do_run()]
+
+        plugin = CustomPlugin('listed', [0])
+        coordinator = Coordinator(self.edda_client, Alerter(''), {}, {})
+
+        coordinator.run(plugin)
+
+        self.assertEqual([alert[1] for alert in coordinator.alerter.recorded_alerts], ['from-run'])
+
+    def test_run_deadline(self):
+        alerter = Alerter('')
+        coordinator = Coordinator(self.edda_client, alerter, {'run_timeout': 0.2}, {})
+
+        coordinator.run_all([SlowPlugin('first', [0.1, 0.2]), SlowPlugin('second', [0])])
+
+        self.assertEqual([a[1] for a in alerter.recorded_alerts], ['first-0'])
+        self.assertEqual(coordinator.metrics.plugins['second']['timed_out'], 1)
+
+    def test_status_committed_per_plugin(self):
+        status = Mock()
+        status.__contains__ = Mock(return_value=True)
+        status.__getitem__ = Mock(return_value={})
+        coordinator = Coordinator(self.edda_client, Alerter(''), {}, status)
+
+        coordinator.run(SlowPlugin('foo', [0]))
+
+        status.commit.assert_called_once_with('plugin.foo')
+
+    def test_plugin_error_with_deadline(self):
+        coordinator = Coordinator(self.edda_client, Alerter(''), {'plugin_timeout': 1}, {})
+        plugin = SlowPlugin('broken', [0])
+        plugin.run = Mock(side_effect=ValueError('broken'))
+
+        self.assertRaises(ValueError, coordinator.run, plugin)
+
+    def test_profiled(self):
+        profiler = MagicMock()
+        coordinator = Coordinator(self.edda_client, Alerter(''), {'plugin_timeout': 1}, {}, account='prod',
+                                  profiler=profiler)
+
+        coordinator.run(SlowPlugin('foo', [0]))
+
+        profiler.profile.assert_called_once_with('prod.foo')
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
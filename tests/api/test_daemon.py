@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+import unittest
+from mock import patch, Mock
+
+from api.alerter import Alerter
+from api.daemon import Daemon
+from api.eddaclient import EddaClient
+from api.responsecache import ResponseCache
+
+
+class RecordingPlugin:
+    def __init__(self, name):
+        self.plugin_name = name
+        self.runs = []
+
+    def init(self, edda_client, config, status):
+        self.edda_client = edda_client
+
+    def run(self):
+        self.runs.append((self.edda_client._since, self.edda_client._until))
+        return [{'plugin_name': self.plugin_name, 'id': 'x', 'details': ['alert']}]
+
+
+class DaemonTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.edda_client = EddaClient('http://localhost:8888/edda').with_cache(ResponseCache(ttl=600))
+        self.alerter = Alerter('')
+        self.save_status = Mock()
+        self.fast = RecordingPlugin('fast')
+        self.slow = RecordingPlugin('slow')
+        config = {'plugin.fast': {'interval': 300}, 'plugin.slow': {'interval': 3600}}
+        self.status = {'since': 1000}
+        self.daemon = Daemon(self.edda_client, self.alerter, config, self.status, [self.fast, self.slow],
+                             self.save_status)
+
+    @patch('api.eddaclient.EddaClient.do_query', return_value=[])
+    def test_intervals(self, do_query):
+        self.daemon.tick(10000)
+        self.daemon.tick(10100)
+        self.daemon.tick(10600)
+
+        self.assertEqual(self.fast.runs, [(1000, 9700000), (9700000, 10300000)])
+        self.assertEqual(self.slow.runs, [(1000, 9700000)])
+        self.assertEqual(self.status['schedule'], {'fast': 10300000, 'slow': 9700000})
+        self.assertEqual(self.status['since'], 10300000)
+        self.assertEqual(self.save_status.call_count, 2)
+        self.assertEqual(self.alerter.recorded_alerts, [])
+
+    @patch('api.eddaclient.EddaClient.do_query', return_value=[])
+    def test_warm_cache(self, do_query):
+        self.daemon.tick(10000)
+        enricher = self.daemon.instance_enricher
+        index = enricher._elbs_by_instance
+        self.daemon.tick(10600)
+
+        # the enricher's collections are not time-windowed, they are served from the cache
+        fetched = [c[0][0] for c in do_query.call_args_list]
+        self.assertEqual(fetched.count('http://localhost:8888/edda/api/v2/aws/loadBalancers;_expand'), 1)
+        self.assertIs(enricher._elbs_by_instance, index)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from mock import patch
+
+from api.diskcache import DiskCache, collection_name
+from api.eddaclient import EddaClient
+
+
+class DiskCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.uri = '/api/v2/view/instances;_expand'
+        self.url = 'http://localhost:8888/edda' + self.uri
+        self.response = [{"instanceId": "i-111"}, {"instanceId": "i-222"}]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_collection_name(self):
+        self.assertEqual(collection_name('/api/v2/view/instances;_expand'), 'instances')
+        self.assertEqual(collection_name('/api/v2/aws/securityGroups;_expand;_since=1'), 'securityGroups')
+        self.assertEqual(collection_name('/api/v2/aws/iamUsers/bob;_diff=200'), 'iamUsers')
+
+    def test_get_put(self):
+        cache = DiskCache(self.directory, {'instances': 60})
+        self.assertIsNone(cache.get(self.uri, self.url))
+        cache.put(self.uri, self.url, self.response)
+        self.assertEqual(cache.get(self.uri, self.url), self.response)
+        self.assertIsNone(cache.get(self.uri, self.url + ';_since=1'))
+
+    def test_disabled_collection(self):
+        cache = DiskCache(self.directory, {'instances': 60})
+        uri = '/api/v2/aws/securityGroups;_expand'
+        cache.put(uri, 'http://localhost:8888/edda' + uri, self.response)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_default_ttl(self):
+        cache = DiskCache(self.directory, {'default': 60})
+        cache.put(self.uri, self.url, self.response)
+        self.assertEqual(cache.get(self.uri, self.url), self.response)
+
+    def test_expired(self):
+        cache = DiskCache(self.directory, {'instances': 60})
+        cache.put(self.uri, self.url, self.response)
+        with patch('time.time', return_value=time.time() + 120):
+            self.assertIsNone(cache.get(self.uri, self.url))
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_corrupt_entry(self):
+        cache = DiskCache(self.directory, {'instances': 60})
+        cache.put(self.uri, self.url, self.response)
+        with open(cache._path(self.url), 'w') as f:
+            f.write('invalid')
+        self.assertIsNone(cache.get(self.uri, self.url))
+
+    def test_evict_least_recently_used(self):
+        cache = DiskCache(self.directory, {'instances': 60})
+        for i in range(3):
+            cache.put(self.uri, self.url + str(i), self.response)
+            os.utime(cache._path(self.url + str(i)), (1000 + i, time.time()))
+        # touch the oldest one
+        cache.get(self.uri, self.url + '0')
+
+        cache.max_bytes = 2 * os.path.getsize(cache._path(self.url + '0'))
+        cache.evict()
+
+        self.assertIsNotNone(cache.get(self.uri, self.url + '0'))
+        self.assertIsNone(cache.get(self.uri, self.url + '1'))
+        self.assertIsNotNone(cache.get(self.uri, self.url + '2'))
+
+    @patch('api.eddaclient.EddaClient.do_query', return_value=[{"instanceId": "i-111"}])
+    def test_eddaclient_uses_disk_cache(self, do_query):
+        cache = DiskCache(self.directory, {'instances': 60})
+        EddaClient('http://localhost:8888/edda').with_disk_cache(cache).query(self.uri)
+        # a new client (next run) with an empty in-memory cache
+        edda_client = EddaClient('http://localhost:8888/edda').with_disk_cache(cache)
+        self.assertEqual(edda_client.clean().query(self.uri), [{"instanceId": "i-111"}])
+        self.assertEqual(do_query.call_count, 1)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -5,7 +5,10 @@ from mock import patch, Mock
 from httpretty import HTTPretty, httprettified
 from urllib2 import HTTPError
 
-from api.eddaclient import EddaClient, EddaException
+from api.eddaclient import EddaClient, EddaException, field_selector
+from api.httptransport import HTTPTransport
+from api.metrics import QueryStats
+from api.responsecache import ResponseCache
 
 
 class EddaClientTestCase(unittest.TestCase):
@@ -28,6 +31,106 @@ class EddaClientTestCase(unittest.TestCase):
         self.assertEqual(res, self.expected_response)
         self.assertEqual(self.eddaclient._cache[self.eddaURL + '/api/v2/view/instances'], self.expected_response)
 
+    @patch('api.eddaclient.EddaClient.do_query', return_value=["i-111", "i-222"])
+    def test_query_stats(self, *mocks):
+        stats = QueryStats()
+        eddaclient = self.eddaclient.with_stats(stats)
+        eddaclient.query('/api/v2/view/instances')
+        eddaclient.clean().query('/api/v2/view/instances')
+        self.eddaclient.query('/api/v2/view/instances')
+
+        self.assertEqual(stats.counters['queries'], 2)
+        self.assertEqual(stats.counters['cache_hits'], 1)
+        self.assertEqual(stats.counters['cache_misses'], 1)
+
+    @httprettified
+    def test_query_stats_network(self):
+        HTTPretty.register_uri(HTTPretty.GET, self.eddaURL + '/api/v2/view/instances', body='["i-111", "i-222"]')
+        stats = QueryStats()
+        self.eddaclient.with_stats(stats).query('/api/v2/view/instances')
+
+        self.assertEqual(stats.counters['edda_requests'], 1)
+        self.assertEqual(stats.counters['bytes'], len('["i-111", "i-222"]'))
+
+    @httprettified
+    def test_cached_size(self):
+        HTTPretty.register_uri(HTTPretty.GET, self.eddaURL + '/api/v2/view/instances', body='["i-111", "i-222"]')
+        cache = ResponseCache(max_bytes=1000)
+        self.eddaclient.with_cache(cache).query('/api/v2/view/instances')
+
+        self.assertEqual(cache.size, len('["i-111", "i-222"]'))
+
+    @patch('api.eddaclient.EddaClient.do_query')
+    def test_local_views(self, do_query):
+        do_query.return_value = [
+            {"stime": 100, "ltime": None, "data": {"groupId": "sg-1"}},
+            {"stime": 300, "ltime": None, "data": {"groupId": "sg-2"}},
+            {"stime": 600, "ltime": None, "data": {"groupId": "sg-3"}},
+        ]
+        eddaclient = self.eddaclient.with_local_views()
+        uri = '/api/v2/aws/securityGroups;_expand'
+
+        self.assertEqual(eddaclient.query(uri), [{"groupId": "sg-1"}, {"groupId": "sg-2"}, {"groupId": "sg-3"}])
+        self.assertEqual(eddaclient.since(200).query(uri),
+                         [{"groupId": "sg-1"}, {"groupId": "sg-2"}, {"groupId": "sg-3"}])
+        self.assertEqual(eddaclient.since(200).until(700).updateonly().query(uri),
+                         [{"groupId": "sg-2"}, {"groupId": "sg-3"}])
+        self.assertEqual(eddaclient.since(200).updateonly().clean().query(uri),
+                         [{"groupId": "sg-1"}, {"groupId": "sg-2"}, {"groupId": "sg-3"}])
+
+        do_query.assert_called_once_with(self.eddaURL + uri + ';_meta')
+
+    @patch('api.eddaclient.EddaClient.do_query')
+    def test_local_views_modified_after_until(self, do_query):
+        do_query.side_effect = lambda url: [{"stime": 100, "ltime": None, "data": {"groupId": "sg-1"}},
+                                            {"stime": 600, "ltime": None, "data": {"groupId": "sg-2"}}] \
+            if url.endswith(';_meta') else [{"groupId": "sg-1"}, {"groupId": "sg-2", "revision": "before"}]
+        eddaclient = self.eddaclient.with_local_views()
+        uri = '/api/v2/aws/securityGroups;_expand'
+
+        # only EDDA has the revision of sg-2 before the end of the window
+        self.assertEqual(eddaclient.since(200).until(500).query(uri),
+                         [{"groupId": "sg-1"}, {"groupId": "sg-2", "revision": "before"}])
+        self.assertEqual([c[0][0] for c in do_query.call_args_list],
+                         [self.eddaURL + uri + ';_meta', self.eddaURL + uri + ';_since=200;_until=500'])
+
+    @patch('api.eddaclient.EddaClient.do_query')
+    def test_iter_query_local_views(self, do_query):
+        do_query.return_value = [{"stime": 100, "ltime": None, "data": {"groupId": "sg-1"}},
+                                 {"stime": 300, "ltime": None, "data": {"groupId": "sg-2"}}]
+        eddaclient = self.eddaclient.with_local_views()
+        uri = '/api/v2/aws/securityGroups;_expand'
+
+        self.assertEqual(list(eddaclient.since(200).updateonly().iter_query(uri)), [{"groupId": "sg-2"}])
+        do_query.assert_called_once_with(self.eddaURL + uri + ';_meta')
+
+    @patch('api.eddaclient.EddaClient.do_query', return_value=["i-111", "i-222"])
+    def test_local_views_not_applicable(self, do_query):
+        eddaclient = self.eddaclient.with_local_views().since(200)
+        eddaclient.query('/api/v2/aws/iamUsers')
+        eddaclient.query('/api/v2/aws/iamUsers/bob;_expand')
+        eddaclient.every().query('/api/v2/aws/securityGroups;_expand')
+
+        self.assertEqual([c[0][0] for c in do_query.call_args_list], [
+            self.eddaURL + '/api/v2/aws/iamUsers;_since=200',
+            self.eddaURL + '/api/v2/aws/iamUsers/bob;_expand;_since=200',
+            self.eddaURL + '/api/v2/aws/securityGroups;_expand;_all;_since=200',
+        ])
+
+    def test_field_selector(self):
+        self.assertEqual(field_selector(['instanceId']), '(instanceId)')
+        self.assertEqual(field_selector(['tags.value', 'instanceId', 'tags.key']), '(instanceId,tags:(key,value))')
+        self.assertEqual(field_selector(['a.b.c', 'a', 'a.d']), '(a)')
+
+    def test_projections(self):
+        eddaclient = self.eddaclient.with_projections({'/api/v2/view/instances;_expand': ['instanceId', 'tags.key']})
+        self.assertEqual(eddaclient.since(1)._construct_uri('/api/v2/view/instances;_expand'),
+                         self.eddaURL + '/api/v2/view/instances;_expand:(instanceId,tags:(key));_since=1')
+        self.assertEqual(eddaclient.clean()._construct_uri('/api/v2/view/instances;_expand;_meta'),
+                         self.eddaURL + '/api/v2/view/instances;_expand:(data:(instanceId,tags:(key)),ltime,stime);_meta')
+        self.assertEqual(eddaclient._construct_uri('/api/v2/aws/securityGroups;_expand'),
+                         self.eddaURL + '/api/v2/aws/securityGroups;_expand')
+
     @httprettified
     def test_do_query(self):
         HTTPretty.register_uri(HTTPretty.GET, self.eddaURL + '/api/v2/view/instances',
@@ -35,6 +138,13 @@ class EddaClientTestCase(unittest.TestCase):
                                status=200)
         self.assertEqual(self.eddaclient.query('/api/v2/view/instances'), self.expected_response)
 
+    def test_transport(self):
+        transport = HTTPTransport()
+        self.assertIs(self.eddaclient.with_transport(transport).transport(), transport)
+        # created on first use
+        self.assertIsInstance(self.eddaclient.transport(), HTTPTransport)
+        self.assertIs(self.eddaclient.transport(), self.eddaclient.transport())
+
     @httprettified
     def test_do_query_exception(self):
         HTTPretty.register_uri(HTTPretty.GET, self.eddaURL + '/api/v2/view/instances',
@@ -56,6 +166,26 @@ class EddaClientTestCase(unittest.TestCase):
                                status=200)
         self.assertRaises(ValueError, self.eddaclient.query, ('/api/v2/view/instances'))
 
+    @httprettified
+    def test_iter_query(self):
+        HTTPretty.register_uri(HTTPretty.GET, self.eddaURL + '/api/v2/view/instances',
+                               body=json.dumps(self.expected_response),
+                               status=200)
+        self.assertEqual(list(self.eddaclient.iter_query('/api/v2/view/instances')), self.expected_response)
+        self.assertNotIn(self.eddaURL + '/api/v2/view/instances', self.eddaclient._cache)
+
+    @patch('api.eddaclient.EddaClient.do_query', return_value=["i-111", "i-222"])
+    def test_iter_query_cached(self, *mocks):
+        self.eddaclient.query('/api/v2/view/instances')
+        self.assertEqual(list(self.eddaclient.iter_query('/api/v2/view/instances')), self.expected_response)
+
+    @httprettified
+    def test_iter_query_error(self):
+        HTTPretty.register_uri(HTTPretty.GET, self.eddaURL + '/api/v2/view/instances',
+                               body='{"code": "xxxx", "asd": "b"}',
+                               status=200)
+        self.assertRaises(EddaException, list, self.eddaclient.iter_query('/api/v2/view/instances'))
+
     @httprettified
     def test_raw_query(self):
         HTTPretty.register_uri(HTTPretty.GET, self.eddaURL + '/api/v2/view/instances',
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+import gzip
+import StringIO
+import unittest
+from httpretty import HTTPretty, httprettified
+from urllib2 import HTTPError
+
+from api.httptransport import HTTPTransport
+
+
+class HTTPTransportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.url = 'http://localhost:8888/edda/api/v2/view/instances'
+        self.transport = HTTPTransport(timeout=5, pool_size=2)
+
+    @httprettified
+    def test_read(self):
+        HTTPretty.register_uri(HTTPretty.GET, self.url, body='["i-111"]', status=200)
+        self.assertEqual(self.transport.read(self.url), (200, '["i-111"]'))
+        self.assertEqual(HTTPretty.last_request.headers['accept-encoding'], 'gzip')
+
+    @httprettified
+    def test_gzip(self):
+        body = StringIO.StringIO()
+        with gzip.GzipFile(fileobj=body, mode='w') as f:
+            f.write('["i-111", "i-222"]')
+        HTTPretty.register_uri(HTTPretty.GET, self.url, body=body.getvalue(), status=200,
+                               adding_headers={'Content-Encoding': 'gzip'})
+        self.assertEqual(''.join(self.transport.iter_content(self.url, 4)), '["i-111", "i-222"]')
+
+    @httprettified
+    def test_errors(self):
+        HTTPretty.register_uri(HTTPretty.GET, self.url, body='{"code": 400}', status=400)
+        self.assertEqual(self.transport.read(self.url), (400, '{"code": 400}'))
+
+        HTTPretty.register_uri(HTTPretty.GET, self.url, body='error', status=500)
+        self.assertRaises(HTTPError, self.transport.read, self.url)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
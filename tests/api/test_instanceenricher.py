@@ -147,13 +147,41 @@ class InstanceEnricherTestCase(unittest.TestCase):
             ]
         }
 
-        self.instance_enricher.enrich(INSTANCE_DATA)
+        enriched = self.instance_enricher.enrich(INSTANCE_DATA)
 
-        self.assertIn("elbs", INSTANCE_DATA)
-        self.assertEqual(2, len(INSTANCE_DATA["elbs"]))
-        self.assertIn("rules", INSTANCE_DATA["securityGroups"][0])
-        self.assertEqual(1, len(INSTANCE_DATA["securityGroups"][0]["rules"]))
-        self.assertEqual("jenkins", INSTANCE_DATA["service_type"])
+        self.assertIn("elbs", enriched)
+        self.assertEqual(2, len(enriched["elbs"]))
+        self.assertIn("rules", enriched["securityGroups"][0])
+        self.assertEqual(1, len(enriched["securityGroups"][0]["rules"]))
+        self.assertEqual("jenkins", enriched["service_type"])
+        self.assertEqual("A", enriched.get("instanceId"))
+        self.assertEqual(enriched["securityGroups"][0]["groupName"], "jenkins")
+
+        # the EDDA record is left untouched
+        self.assertNotIn("elbs", INSTANCE_DATA)
+        self.assertNotIn("service_type", INSTANCE_DATA)
+        self.assertNotIn("rules", INSTANCE_DATA["securityGroups"][0])
+        self.assertItemsEqual(enriched.keys(), INSTANCE_DATA.keys() + ["elbs", "service_type"])
+        self.assertEqual(len(enriched), len(INSTANCE_DATA) + 2)
+
+    def test_enrich_elb_index(self):
+        foo = {"DNSName": "foo.prezi.com", "instances": ["A", "B", "A"], "ports": ["80"]}
+        bar = {"DNSName": "bar.prezi.com", "instances": ["B"], "ports": ["80"]}
+        self.edda_client.query = Mock(side_effect=[
+            [{"DNSName": "foo.prezi.com", "instances": [{"instanceId": "A"}],
+              "listenerDescriptions": [{"listener": {"loadBalancerPort": 80}}]}],
+            []
+        ])
+        self.instance_enricher.initialize_caches()
+
+        self.assertEqual([e["DNSName"] for e in self.instance_enricher.enrich({"instanceId": "A"})["elbs"]],
+                         ["foo.prezi.com"])
+        self.assertEqual(self.instance_enricher.enrich({"instanceId": "B"})["elbs"], [])
+
+        self.instance_enricher.elbs = [foo, bar]
+        self.assertEqual(self.instance_enricher.enrich({"instanceId": "A"})["elbs"], [foo])
+        self.assertEqual(self.instance_enricher.enrich({"instanceId": "B"})["elbs"], [foo, bar])
+        self.assertEqual(self.instance_enricher.enrich({"instanceId": "C"})["elbs"], [])
 
     @patch('api.instanceenricher.InstanceEnricher._clean_ip_permissions', return_value=[])
     def test_empty_secgroup_query(self, *mocks):
@@ -199,6 +227,41 @@ class InstanceEnricherTestCase(unittest.TestCase):
         self.assertEqual(report['service_type'], 'jenkins')
         self.assertEqual(report['instanceId'], 'A')
 
+    def test_memoized(self):
+        self.instance_enricher.elbs = self.mock_instance_enrich_elbs
+        self.instance_enricher.sec_groups = self.mock_instance_enrich_secgroups
+
+        enriched = self.instance_enricher.enrich(self.mock_instance_data)
+        other_record = dict(self.mock_instance_data)
+        enriched_again = self.instance_enricher.enrich(other_record)
+        self.assertIs(enriched_again._record, other_record)
+        self.assertIs(enriched_again._overlay, enriched._overlay)
+        self.assertIs(self.instance_enricher.enrich(enriched)._record, self.mock_instance_data)
+
+        with patch('api.instanceenricher.instance_report', return_value={'instanceId': 'A'}) as report_mock:
+            report = self.instance_enricher.report(self.mock_instance_data, {'extra': 1})
+            report['chef_node_name'] = 'foo'
+            self.assertEqual(self.instance_enricher.report(dict(self.mock_instance_data)), {'instanceId': 'A'})
+            self.assertEqual(report_mock.call_count, 1)
+
+        # new ELB data
+        self.instance_enricher.elbs = []
+        self.assertIsNot(self.instance_enricher.enrich(dict(self.mock_instance_data))._overlay, enriched._overlay)
+        self.assertEqual(self.instance_enricher.report(self.mock_instance_data)['elbs'], [])
+
+    def test_memoized_per_version(self):
+        self.instance_enricher.elbs = self.mock_instance_enrich_elbs
+        self.instance_enricher.sec_groups = self.mock_instance_enrich_secgroups
+        older = dict(self.mock_instance_data, tags=[{"key": "Name", "value": "old"}], securityGroups=[])
+        newer = dict(self.mock_instance_data, tags=[{"key": "Name", "value": "new"}], publicIpAddress='1.1.1.1')
+
+        self.assertEqual(self.instance_enricher.enrich(older)['service_type'], 'old')
+        self.assertEqual(self.instance_enricher.enrich(newer)['service_type'], 'new')
+        self.assertEqual(self.instance_enricher.report(older)['service_type'], 'old')
+        self.assertEqual(self.instance_enricher.report(older)['open_ports'], [])
+        newer_report = self.instance_enricher.report(newer)
+        self.assertEqual((newer_report['service_type'], newer_report['publicIpAddress']), ('new', '1.1.1.1'))
+
     def test_instance_report_no_profile(self):
         self.mock_instance_data['iamInstanceProfile'] = None
         self.instance_enricher.elbs = self.mock_instance_enrich_elbs
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+import json
+import unittest
+
+from api.jsonstream import JSONArrayStream
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class JSONArrayStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [
+            {"instanceId": "i-111", "tags": [{"key": "Name", "value": "foo, [bar]"}], "launchTime": 1392100947000},
+            {"instanceId": "i-222", "tags": [], "publicIpAddress": None, "ebsOptimized": False},
+            12345,
+            u"árvíztűrő",
+            [1, 2.5, -3e2]
+        ]
+
+    def test_chunk_sizes(self):
+        text = json.dumps(self.records, indent=2)
+        for size in [1, 2, 3, 7, 64, len(text)]:
+            self.assertEqual(list(JSONArrayStream(chunked(text, size))), self.records)
+
+    def test_utf8_bytes(self):
+        text = json.dumps(self.records, ensure_ascii=False).encode('utf-8')
+        self.assertEqual(list(JSONArrayStream(chunked(text, 1))), self.records)
+
+    def test_empty(self):
+        self.assertEqual(list(JSONArrayStream([' [ ', ' ] '])), [])
+
+    def test_is_array(self):
+        self.assertTrue(JSONArrayStream(['  ', '', ' [1]']).is_array())
+        stream = JSONArrayStream(['{"code": ', '400}'])
+        self.assertFalse(stream.is_array())
+        self.assertEqual(stream.read_all(), '{"code": 400}')
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, list, JSONArrayStream(['invalid']))
+        self.assertRaises(ValueError, list, JSONArrayStream(['[1, 2']))
+        self.assertRaises(ValueError, list, JSONArrayStream(['[1 2]']))
+        self.assertRaises(ValueError, list, JSONArrayStream(['[1, {"a": ]']))
+
+    def test_lazy(self):
+        def chunks():
+            yield '[{"a": 1}, '
+            raise AssertionError('read too much')
+
+        self.assertEqual(next(iter(JSONArrayStream(chunks()))), {"a": 1})
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
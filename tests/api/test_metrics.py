@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from api.metrics import QueryStats, RunMetrics
+
+
+class RunMetricsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = RunMetrics()
+        self.stats = QueryStats()
+        self.stats.add('queries', 3)
+        self.stats.add('bytes', 1024)
+
+    def test_record(self):
+        metrics = self.metrics.record('foo', self.metrics.start(), self.stats, 2)
+
+        self.assertEqual(metrics['queries'], 3)
+        self.assertEqual(metrics['bytes'], 1024)
+        self.assertEqual(metrics['cache_hits'], 0)
+        self.assertEqual(metrics['alerts'], 2)
+        self.assertGreaterEqual(metrics['wall_seconds'], 0)
+        self.assertGreaterEqual(metrics['cpu_seconds'], 0)
+        self.assertEqual(self.metrics.plugins, {'foo': metrics})
+
+    def test_to_prometheus(self):
+        self.metrics.record('foo', self.metrics.start(), self.stats, 2)
+        lines = self.metrics.to_prometheus().splitlines()
+
+        self.assertIn('# TYPE reddalert_plugin_queries gauge', lines)
+        self.assertIn('reddalert_plugin_queries{plugin="foo"} 3.0', lines)
+        self.assertIn('reddalert_plugin_alerts{plugin="foo"} 2.0', lines)
+
+    def test_write(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.metrics.record('foo', self.metrics.start(), self.stats, 2)
+            self.metrics.write(os.path.join(directory, 'statusfile.json'))
+
+            self.assertEqual(sorted(os.listdir(directory)), ['statusfile.metrics.json', 'statusfile.prom'])
+            with open(os.path.join(directory, 'statusfile.metrics.json')) as metrics_file:
+                self.assertEqual(json.load(metrics_file)['plugins']['foo']['queries'], 3)
+        finally:
+            shutil.rmtree(directory)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
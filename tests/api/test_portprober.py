@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+import socket
+import threading
+import time
+import unittest
+from mock import patch, Mock
+
+from api.portprober import PortProber, is_port_open
+
+
+class PortProberTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(5)
+        self.open_port = self.listener.getsockname()[1]
+        # a port nothing listens on
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        self.closed_port = closed.getsockname()[1]
+        closed.close()
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_is_port_open(self):
+        self.assertTrue(is_port_open('127.0.0.1', self.open_port, 1))
+        self.assertFalse(is_port_open('127.0.0.1', self.closed_port, 1))
+
+    def test_probe(self):
+        cache = {}
+        prober = PortProber(cache=cache)
+
+        results = prober.probe([('127.0.0.1', self.open_port), ('127.0.0.1', self.closed_port),
+                                ('127.0.0.1', self.open_port)])
+
+        self.assertEqual(results, {('127.0.0.1', self.open_port): True, ('127.0.0.1', self.closed_port): False})
+        self.assertEqual(sorted(cache.keys()), sorted(['127.0.0.1:%d' % self.open_port,
+                                                       '127.0.0.1:%d' % self.closed_port]))
+
+    @patch('api.portprober.time.time', return_value=1000)
+    def test_cache_ttl(self, now):
+        check = Mock(return_value=True)
+        cache = {'1.1.1.1:22': [False, 500], '2.2.2.2:22': [False, 900]}
+        prober = PortProber(check, cache, ttl=200)
+
+        results = prober.probe([('1.1.1.1', 22), ('2.2.2.2', 22)])
+
+        self.assertEqual(results, {('1.1.1.1', 22): True, ('2.2.2.2', 22): False})
+        check.assert_called_once_with('1.1.1.1', 22)
+        self.assertEqual(cache, {'1.1.1.1:22': [True, 1000], '2.2.2.2:22': [False, 900]})
+
+    def test_probe_any(self):
+        check = Mock(side_effect=lambda host, port: (host, port) == ('a', 22))
+        first = (('a', 22), ('b', 22), ('c', 22))
+        second = (('a', 80), ('a', 81))
+        prober = PortProber(check, {'c:22': [False, time.time()]}, max_workers=1)
+
+        self.assertEqual(prober.probe_any([first, second, first]), {first: True, second: False})
+        # the open port of a stops the probes of the first group
+        self.assertItemsEqual([c[0] for c in check.call_args_list], [('a', 22), ('a', 80), ('a', 81)])
+
+    @patch('api.portprober.time.time', return_value=1000)
+    def test_cache_size(self, now):
+        cache = {'1.1.1.1:22': [False, 600], '2.2.2.2:22': [False, 900]}
+        PortProber(Mock(return_value=True), cache, max_entries=2).probe([('3.3.3.3', 22)])
+
+        self.assertEqual(cache, {'2.2.2.2:22': [False, 900], '3.3.3.3:22': [True, 1000]})
+
+    def test_no_cache(self):
+        cache = {}
+        PortProber(Mock(return_value=False), cache, ttl=0).probe([('1.1.1.1', 22)])
+        self.assertEqual(cache, {})
+
+    def test_concurrency_limits(self):
+        running = {}
+        peaks = {}
+        lock = threading.Lock()
+
+        def check(host, port):
+            with lock:
+                running[host] = running.get(host, 0) + 1
+                peaks[host] = max(peaks.get(host, 0), running[host])
+                peaks['all'] = max(peaks.get('all', 0), sum(running.values()))
+            time.sleep(0.02)
+            with lock:
+                running[host] -= 1
+            return False
+
+        prober = PortProber(check, max_workers=6, per_host=2)
+        prober.probe([(host, port) for host in ['a', 'b', 'c', 'd'] for port in range(10)])
+
+        self.assertLessEqual(peaks.pop('all'), 6)
+        self.assertEqual(max(peaks.values()), 2)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
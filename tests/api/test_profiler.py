@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import os
+import pstats
+import shutil
+import tempfile
+import time
+import unittest
+from mock import patch
+
+from api.profiler import NullProfiler, Profiler
+
+
+def busy_loop(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        sum(xrange(100))
+
+
+class ProfilerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_profile(self):
+        profiler = Profiler(os.path.join(self.directory, 'profiles'), interval=0.001)
+
+        with profiler.profile('secgroups'):
+            busy_loop(0.2)
+
+        stats = pstats.Stats(profiler.path('secgroups', 'pstats'))
+        self.assertIn('busy_loop', [function for _, _, function in stats.stats])
+        with open(profiler.path('secgroups', 'collapsed')) as collapsed_file:
+            lines = collapsed_file.read().splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(any('(test_profile);' in line and '(busy_loop)' in line for line in lines))
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+        self.assertFalse(os.path.exists(profiler.path('secgroups', 'malloc.txt')))
+
+    @patch('api.profiler.tracemalloc', None)
+    def test_memory_unavailable(self):
+        profiler = Profiler(self.directory, memory=True)
+
+        with profiler.profile('iam'):
+            pass
+
+        self.assertFalse(profiler.memory)
+        self.assertItemsEqual(os.listdir(self.directory), ['iam.pstats', 'iam.collapsed'])
+
+    def test_write_error(self):
+        profiler = Profiler(os.path.join(self.directory, 'profiles'))
+        shutil.rmtree(profiler.directory)
+
+        with patch.object(profiler, 'logger') as logger:
+            with profiler.profile('iam'):
+                pass
+
+        self.assertTrue(logger.exception.called)
+        self.assertFalse(logger.info.called)
+
+    def test_null_profiler(self):
+        with NullProfiler().profile('iam'):
+            pass
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
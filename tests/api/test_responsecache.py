@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+import unittest
+from mock import patch
+
+from api.responsecache import ResponseCache
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.response = [{"instanceId": "i-111"}]
+        self.size = 100
+
+    def test_unbounded(self):
+        cache = ResponseCache()
+        for i in range(100):
+            cache['url%d' % i] = self.response
+        self.assertEqual(len(cache), 100)
+        self.assertEqual(cache.evictions, 0)
+
+    def test_hits_and_misses(self):
+        cache = ResponseCache()
+        self.assertIsNone(cache.get('url'))
+        cache['url'] = self.response
+        self.assertEqual(cache.get('url'), self.response)
+        self.assertEqual(cache['url'], self.response)
+        self.assertIn('url', cache)
+        self.assertEqual(cache.stats(), {'entries': 1, 'bytes': 0, 'hits': 1, 'misses': 1, 'evictions': 0,
+                                         'expirations': 0})
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_bytes=2 * self.size)
+        cache.put('url1', self.response, self.size)
+        cache.put('url2', self.response, self.size)
+        cache.get('url1')
+        cache.put('url3', self.response, self.size)
+
+        self.assertIn('url1', cache)
+        self.assertNotIn('url2', cache)
+        self.assertIn('url3', cache)
+        self.assertEqual(cache.size, 2 * self.size)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_replace(self):
+        cache = ResponseCache(max_bytes=2 * self.size)
+        cache.put('url1', self.response, self.size)
+        cache.put('url1', self.response, self.size)
+        self.assertEqual(cache.size, self.size)
+
+    def test_too_large(self):
+        cache = ResponseCache(max_bytes=self.size - 1)
+        cache.put('url1', self.response, self.size)
+        self.assertNotIn('url1', cache)
+        self.assertEqual(cache.size, 0)
+
+    @patch('api.responsecache.time.time', return_value=1000)
+    def test_ttl(self, now):
+        cache = ResponseCache(ttl=60)
+        cache.put('url1', self.response, self.size)
+        now.return_value = 1030
+        cache.put('url2', self.response, self.size)
+        self.assertEqual(cache.get('url1'), self.response)
+
+        now.return_value = 1060
+        self.assertIsNone(cache.get('url1'))
+        self.assertNotIn('url1', cache)
+        self.assertIn('url2', cache)
+
+        now.return_value = 1090
+        cache.expire()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.expirations, 2)
+
+    def test_clear(self):
+        cache = ResponseCache(max_bytes=2 * self.size)
+        cache.put('url1', self.response, self.size)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.size, 0)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
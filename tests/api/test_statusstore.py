@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from api.statusstore import SQLiteStatus, is_sqlite_status
+
+
+class SQLiteStatusTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'statusfile.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def reopen(self, status):
+        status.close()
+        return SQLiteStatus(self.path)
+
+    def rows(self, status):
+        return status.connection.execute("SELECT namespace, key, value FROM status ORDER BY namespace, key").fetchall()
+
+    def items(self, status):
+        return status.connection.execute(
+            "SELECT namespace, key, item, value FROM items ORDER BY namespace, key, item").fetchall()
+
+    def test_is_sqlite_status(self):
+        self.assertTrue(is_sqlite_status('etc/statusfile.db'))
+        self.assertTrue(is_sqlite_status('etc/statusfile.sqlite'))
+        self.assertFalse(is_sqlite_status('etc/statusfile.json'))
+
+    def test_roundtrip(self):
+        status = SQLiteStatus(self.path)
+        status['since'] = 1000
+        status['plugin.ami'] = {'first_seen': {'ami-1': 500}}
+        status.setdefault('plugin.iam', {})['users'] = ['bob']
+        status.commit()
+
+        status = self.reopen(status)
+        self.assertEqual(status['since'], 1000)
+        self.assertEqual(dict(status['plugin.ami']), {'first_seen': {'ami-1': 500}})
+        self.assertEqual(dict(status['plugin.iam']), {'users': ['bob']})
+        self.assertItemsEqual(status.keys(), ['since', 'plugin.ami', 'plugin.iam'])
+
+    def test_in_place_changes(self):
+        status = SQLiteStatus(self.path)
+        status['plugin.ami'] = {'first_seen': {'ami-1': 500}, 'other': [1]}
+        status.commit()
+
+        status = self.reopen(status)
+        status['plugin.ami']['first_seen']['ami-2'] = 600
+        del status['plugin.ami']['other']
+        self.assertEqual(status.commit('plugin.ami'), 2)
+        self.assertEqual(status.commit(), 0)
+
+        status = self.reopen(status)
+        self.assertEqual(dict(status['plugin.ami']), {'first_seen': {'ami-1': 500, 'ami-2': 600}})
+
+    def test_commit_namespace(self):
+        status = SQLiteStatus(self.path)
+        status['plugin.ami'] = {'first_seen': {}}
+        status['plugin.iam'] = {'users': []}
+        status.commit('plugin.ami')
+
+        self.assertEqual(self.rows(status), [('plugin.ami', 'first_seen', None)])
+
+    def test_dict_items(self):
+        status = SQLiteStatus(self.path)
+        status['plugin.route53'] = {'hashes': {'http://a': {'hash': '1'}, 'http://b': {'hash': '2'}}}
+        status.commit()
+        self.assertEqual(self.items(status), [('plugin.route53', 'hashes', 'http://a', '{"hash": "1"}'),
+                                              ('plugin.route53', 'hashes', 'http://b', '{"hash": "2"}')])
+
+        status = self.reopen(status)
+        # replaced by a new dict, only the changed items are written
+        status['plugin.route53']['hashes'] = {'http://a': {'hash': '1'}, 'http://c': {'hash': '3'}}
+        self.assertEqual(status.commit(), 2)
+        self.assertEqual(self.items(status), [('plugin.route53', 'hashes', 'http://a', '{"hash": "1"}'),
+                                              ('plugin.route53', 'hashes', 'http://c', '{"hash": "3"}')])
+
+        status['plugin.route53']['hashes'] = ['not a dict']
+        status.commit()
+        self.assertEqual(self.items(status), [])
+        status['plugin.route53'] = {'hashes': {'http://d': {}}}
+        status.commit()
+
+        status = self.reopen(status)
+        self.assertEqual(dict(status['plugin.route53']), {'hashes': {'http://d': {}}})
+        self.assertEqual(self.items(status), [('plugin.route53', 'hashes', 'http://d', '{}')])
+
+    def test_replace_namespace(self):
+        status = SQLiteStatus(self.path)
+        status['plugin.route53'] = {'known': ['a'], 'hashes': {}}
+        status.commit()
+
+        status['plugin.route53'] = {'known': ['b']}
+        del status['plugin.route53']['known']
+        status['plugin.route53']['known'] = ['c']
+        status.commit()
+
+        self.assertEqual(self.rows(status), [('plugin.route53', 'known', '["c"]')])
+
+    def test_lazy_loading(self):
+        status = SQLiteStatus(self.path)
+        status['plugin.ami'] = {'first_seen': {'ami-1': 500}}
+        status['plugin.chef'] = {'first_seen': {'i-1': 500}}
+        status.commit()
+
+        status = self.reopen(status)
+        status['plugin.ami']['first_seen']
+        self.assertNotIn('plugin.chef', status._namespaces)
+        self.assertEqual(status['plugin.ami']._values.keys(), ['first_seen'])
+
+    def test_migrate(self):
+        json_file = os.path.join(self.directory, 'statusfile.json')
+        with open(json_file, 'w') as out_data:
+            json.dump({'since': 1000, 'plugin.ami': {'first_seen': {'ami-1': 500}}, 'plugin.elbs': {}}, out_data)
+
+        status = SQLiteStatus(self.path, migrate_from=json_file)
+        self.assertEqual(status['since'], 1000)
+        self.assertEqual(dict(status['plugin.ami']), {'first_seen': {'ami-1': 500}})
+
+        # only the first time
+        with open(json_file, 'w') as out_data:
+            json.dump({'since': 2000}, out_data)
+        status.close()
+        self.assertEqual(SQLiteStatus(self.path, migrate_from=json_file)['since'], 1000)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ import os
 import unittest
 from mock import patch, Mock, call
 
-from plugins import NewAMIPlugin
+from plugins.ami import NewAMIPlugin
 from api import InstanceEnricher
 
 
@@ -36,7 +36,7 @@ class PluginAmiTestCase(unittest.TestCase):
                 {'imageId': 'ami-2', 'instanceId': 'c', 'launchTime': '400'}]
 
         m = Mock()
-        m.query = Mock(side_effect=ret_list)
+        m.iter_query = Mock(side_effect=ret_list)
         eddaclient.soft_clean = Mock(return_value=m)
         self.plugin.init(eddaclient, self.config, {'first_seen': {"ami-1": 1000, "ami-2": 400}}, instance_enricher)
 
@@ -49,13 +49,13 @@ class PluginAmiTestCase(unittest.TestCase):
         self.assertIn('a', [d['instanceId'] for d in result['details']])
         self.assertIn('b', [d['instanceId'] for d in result['details']])
 
-        m.query.assert_has_calls([call('/api/v2/view/instances;_expand')])
+        m.iter_query.assert_has_calls([call('/api/v2/view/instances;_expand')])
         self.assertEqual(self.plugin.status, {'first_seen': {'ami-1': 500, 'ami-2': 400}})
 
     def test_skipped_service(self):
         instance_enricher = InstanceEnricher(Mock())
         eddaclient = Mock()
-        eddaclient.query = Mock(return_value=[
+        eddaclient.iter_query = Mock(return_value=[
             {'imageId': 'ami-1', 'instanceId': 'b', 'launchTime': '2000',
              'tags': [{'key': 'service_name', 'value': 'jenkins'}]}])
         uncleaned_eddaclient = Mock()
@@ -68,7 +68,7 @@ class PluginAmiTestCase(unittest.TestCase):
         expected = []
 
         self.assertEqual(expected, real)
-        eddaclient.query.assert_has_calls([call('/api/v2/view/instances;_expand')])
+        eddaclient.iter_query.assert_has_calls([call('/api/v2/view/instances;_expand')])
 
 
 def main():
@@ -5,7 +5,7 @@ import unittest
 from mock import patch, Mock, MagicMock
 
 from api import InstanceEnricher
-from plugins import NonChefPlugin
+from plugins.chef import NonChefPlugin
 
 
 class PluginNonChefTestCase(unittest.TestCase):
@@ -47,7 +47,7 @@ class PluginNonChefTestCase(unittest.TestCase):
             ]
 
         m = Mock()
-        m.query = Mock(side_effect=ret_list)
+        m.iter_query = Mock(side_effect=ret_list)
         eddaclient.soft_clean = Mock(return_value=m)
         eddaclient._since = 3 * 3600000
         eddaclient._until = 4 * 3600000 + 1
@@ -89,7 +89,7 @@ class PluginNonChefTestCase(unittest.TestCase):
             ]
 
         m = Mock()
-        m.query = Mock(side_effect=ret_list)
+        m.iter_query = Mock(side_effect=ret_list)
         eddaclient.soft_clean = Mock(return_value=m)
         eddaclient._since = 3 * 3600000
         eddaclient._until = 4 * 3600000 + 1
@@ -138,7 +138,7 @@ class PluginNonChefTestCase(unittest.TestCase):
             ]
 
         m = Mock()
-        m.query = Mock(side_effect=ret_list)
+        m.iter_query = Mock(side_effect=ret_list)
         eddaclient.soft_clean = Mock(return_value=m)
         eddaclient._since = 10 * 3600000
         eddaclient._until = 11 * 3600000
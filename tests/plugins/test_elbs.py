@@ -3,7 +3,7 @@ import os
 import unittest
 from mock import patch, Mock, call
 
-from plugins import ElasticLoadBalancerPlugin
+from plugins.elbs import ElasticLoadBalancerPlugin
 
 
 class PluginElbTestCase(unittest.TestCase):
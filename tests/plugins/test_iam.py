@@ -1,9 +1,13 @@
 #!/usr/bin/env python
+import json
 import os
+import socket
 import unittest
+import urllib2
 from mock import Mock, call
 
-from plugins import UserAddedPlugin
+from api.eddaclient import EddaException
+from plugins.iam import UserAddedPlugin
 
 APPDIR = "%s/" % os.path.dirname(os.path.realpath(__file__ + '/../'))
 
@@ -17,25 +21,30 @@ class PluginIamTestCase(unittest.TestCase):
     def test_run(self, *mocks):
 
         eddaclient = Mock()
-        default_users = ['bob', 'alice']
+        default_users = ['bob', 'alice', 'carol']
         whitelisted_users = ['whitelisteduser123123']
         allowed_list = ['^whitelisteduser[\d]{6}$']
-        users = default_users + whitelisted_users
-        diff_call_format = '/api/v2/aws/iamUsers/%s;_diff=200'
+        users = default_users + whitelisted_users + ['bob']
+        revisions_call_format = '/api/v2/aws/iamUsers/%s;_limit=200'
 
         def ret_list(args):
             return users
 
-        def ret_user_diff(args):
-            if args == diff_call_format % 'alice':
-                return open(APPDIR + 'test_data/test_iam_diff.txt').read()
+        def ret_user_revisions(args):
+            if args == revisions_call_format % 'alice':
+                return json.load(open(APPDIR + 'test_data/test_iam_revisions.json'))
+            elif args == revisions_call_format % 'carol':
+                return [{'name': 'carol', 'groups': []}]
             else:
-                return '"diff" without group change'
+                return [{'name': 'bob', 'groups': ['admins'], 'accessKeys': []},
+                        {'name': 'bob', 'groups': ['admins'], 'accessKeys': [{'accessKeyId': 'xxx'}]}]
 
         m = Mock()
         m.query = Mock(side_effect=ret_list)
-        eddaclient.raw_query = Mock(side_effect=ret_user_diff)
         eddaclient.updateonly = Mock(return_value=m)
+        every = Mock()
+        every.query = Mock(side_effect=ret_user_revisions)
+        eddaclient.every = Mock(return_value=every)
 
         mocked_config = {}
         mocked_config['allowed'] = allowed_list
@@ -45,11 +54,39 @@ class PluginIamTestCase(unittest.TestCase):
         # run the tested method
         self.assertEqual(self.plugin.run(), [
             {'id': 'alice', 'plugin_name': 'iam',
-             'details': ['Groups the user has been added to: developers, devops']}])
+             'details': ['Groups the user has been added to: devops']},
+            {'id': 'carol', 'plugin_name': 'iam',
+             'details': ["New user has been added: {   'groups': [], 'name': 'carol'}\n"]}])
 
         m.query.assert_has_calls([call('/api/v2/aws/iamUsers')])
-        # switched to assertEqual so we can detect if the whitelisted user is indeed not checked
-        self.assertEqual(eddaclient.raw_query.call_args_list, [call(diff_call_format % username) for username in default_users])
+        # switched to assertItemsEqual so we can detect if the whitelisted user is indeed not checked
+        self.assertItemsEqual(every.query.call_args_list,
+                              [call(revisions_call_format % username) for username in default_users])
+
+    def test_edda_error(self):
+        eddaclient = Mock()
+        eddaclient.every.return_value.query = Mock(side_effect=EddaException({'code': 500, 'message': 'boom'}))
+
+        self.plugin.init(eddaclient, {}, {})
+
+        self.assertEqual(self.plugin.check_user('bob'), ('bob', []))
+
+    def test_network_error(self):
+        errors = {'bob': urllib2.HTTPError('http://edda', 502, 'Bad Gateway', {}, None),
+                  'joe': socket.error('Connection reset by peer')}
+
+        def query(uri):
+            username = uri.split('/')[-1].split(';')[0]
+            if username in errors:
+                raise errors[username]
+            return [{'userName': username}]
+
+        eddaclient = Mock()
+        eddaclient.updateonly.return_value.query.return_value = ['alice', 'bob', 'joe']
+        eddaclient.every.return_value.query = Mock(side_effect=query)
+        self.plugin.init(eddaclient, {}, {})
+
+        self.assertEqual([alert['id'] for alert in self.plugin.run()], ['alice'])
 
 
 def main():
@@ -4,7 +4,7 @@ import unittest
 from mock import patch, Mock, call
 
 from api import InstanceEnricher
-from plugins import MissingInstanceTagPlugin
+from plugins.instancetags import MissingInstanceTagPlugin
 
 
 class PluginMissingInstanceTagTestCase(unittest.TestCase):
@@ -28,7 +28,7 @@ class PluginMissingInstanceTagTestCase(unittest.TestCase):
             ]
 
         m = Mock()
-        m.query = Mock(side_effect=ret_list)
+        m.iter_query = Mock(side_effect=ret_list)
         eddaclient.clean = Mock(return_value=m)
         self.plugin.init(eddaclient, Mock(), {}, instance_enricher)
 
@@ -41,7 +41,7 @@ class PluginMissingInstanceTagTestCase(unittest.TestCase):
         self.assertEqual(1, len(result["details"]))
         self.assertIn("instanceId", result["details"][0])
 
-        m.query.assert_has_calls([call('/api/v2/view/instances;_expand')])
+        m.iter_query.assert_has_calls([call('/api/v2/view/instances;_expand')])
 
 
 def main():
@@ -2,7 +2,7 @@
 import unittest
 from mock import patch, Mock, call
 
-from plugins import NewInstanceTagPlugin
+from plugins.instancetags import NewInstanceTagPlugin
 from api import InstanceEnricher
 
 
@@ -26,7 +26,7 @@ class PluginNewInstanceTagTestCase(unittest.TestCase):
             ]
 
         m = Mock()
-        m.query = Mock(side_effect=ret_list)
+        m.iter_query = Mock(side_effect=ret_list)
         eddaclient.clean = Mock(return_value=m)
         self.plugin.init(eddaclient, Mock(), {}, instance_enricher)
 
@@ -39,7 +39,7 @@ class PluginNewInstanceTagTestCase(unittest.TestCase):
         self.assertIn("b", [d["instanceId"] for d in result["details"]])
         self.assertIn("c", [d["instanceId"] for d in result["details"]])
 
-        m.query.assert_has_calls([call('/api/v2/view/instances;_expand')])
+        m.iter_query.assert_has_calls([call('/api/v2/view/instances;_expand')])
 
     def test_ignore_tags(self, *mocks):
         instance_enricher = InstanceEnricher(Mock())
@@ -54,7 +54,7 @@ class PluginNewInstanceTagTestCase(unittest.TestCase):
             ]
 
         m = Mock()
-        m.query = Mock(side_effect=ret_list)
+        m.iter_query = Mock(side_effect=ret_list)
         eddaclient.clean = Mock(return_value=m)
         self.plugin.init(eddaclient, Mock(), {}, instance_enricher)
 
@@ -62,7 +62,7 @@ class PluginNewInstanceTagTestCase(unittest.TestCase):
         result = self.plugin.run()
         self.assertEqual(0, len(result))
 
-        m.query.assert_has_calls([call('/api/v2/view/instances;_expand')])
+        m.iter_query.assert_has_calls([call('/api/v2/view/instances;_expand')])
 
 
 def main():
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+import sys
+import unittest
+
+import plugins
+from plugins import PluginRegistry, load_class, plugin_list, PLUGINS
+
+
+class PluginRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.instancetags = sys.modules.get('plugins.instancetags')
+
+    def tearDown(self):
+        # the other tests keep using the classes of the module imported first
+        if self.instancetags:
+            sys.modules['plugins.instancetags'] = plugins.instancetags = self.instancetags
+
+    def test_rule_names(self):
+        self.assertItemsEqual(plugin_list.keys(), PLUGINS.keys())
+        self.assertIn('elbs', plugin_list)
+        self.assertNotIn('foo', plugin_list)
+
+    def test_lazy_loading(self):
+        registry = PluginRegistry({'newtag': 'instancetags:NewInstanceTagPlugin'})
+        sys.modules.pop('plugins.instancetags', None)
+
+        self.assertIn('newtag', registry)
+        self.assertNotIn('plugins.instancetags', sys.modules)
+        plugin = registry['newtag']
+        self.assertEqual(plugin.plugin_name, 'newtag')
+        self.assertIs(registry['newtag'], plugin)
+
+    def test_load_class(self):
+        from plugins.elbs import ElasticLoadBalancerPlugin
+        self.assertIs(load_class('elbs:ElasticLoadBalancerPlugin'), ElasticLoadBalancerPlugin)
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
@@ -71,6 +71,20 @@ class Route53ChangedDoesNotExist(unittest.TestCase):
         results = list(page_process_for_route53changed('https://my404.prezi.com'))
         self.assertEquals(["not exists?"], results[1]["matches"])
 
+    @patch('plugins.route53.urllib2.urlopen')
+    def test_error_responses(self, urlopen):
+        import StringIO
+        import urllib2
+
+        urlopen.side_effect = urllib2.HTTPError('https://gone.prezi.com', 400, 'Bad Request', {},
+                                                StringIO.StringIO('NoSuchBucket'))
+        self.assertEquals(['NoSuchBucket|NoSuchKey|NoSuchVersion'],
+                          page_process_for_route53changed('https://gone.prezi.com')[1]["matches"])
+
+        urlopen.side_effect = urllib2.HTTPError('https://gone.prezi.com', 500, 'Error', {},
+                                                StringIO.StringIO('NoSuchBucket'))
+        self.assertEquals({"hash": "-", "matches": []}, page_process_for_route53changed('https://gone.prezi.com')[1])
+
 
 def main():
     unittest.main()
@@ -3,7 +3,7 @@ import socket
 import unittest
 from mock import patch, Mock, call, MagicMock
 
-from plugins import S3AclPlugin
+from plugins.s3acl import S3AclPlugin
 from boto.s3.key import Key
 from boto.exception import S3ResponseError
 
@@ -104,7 +104,7 @@ class PluginS3AclTestCase(unittest.TestCase):
             else:
                 return population
 
-        with patch('plugins.S3AclPlugin.sample_population', side_effect=ret_sample) as MockClass:
+        with patch('plugins.s3acl.S3AclPlugin.sample_population', side_effect=ret_sample) as MockClass:
             bucket = Mock()
             bucket.name = 'bucket1'
             prefix = Mock()
@@ -125,7 +125,7 @@ class PluginS3AclTestCase(unittest.TestCase):
             self.plugin.init(Mock(), {'user': 'bob', 'key': 'xxx'}, {})
             self.assertEqual(self.plugin.traverse_bucket(bucket, ''), [key])
 
-    @patch('plugins.S3AclPlugin.sample_population', return_value=[Mock()])
+    @patch('plugins.s3acl.S3AclPlugin.sample_population', return_value=[Mock()])
     def test_do_run(self, *mocks):
 
         key1 = Mock(Key)
@@ -145,9 +145,9 @@ class PluginS3AclTestCase(unittest.TestCase):
         def ret_buckets(key):
             return []
 
-        with patch('plugins.S3AclPlugin.traverse_bucket', return_value=[key1, key2]) as MockClass,\
-             patch('plugins.S3AclPlugin.suspicious_object_grants', side_effect=ret_keys),\
-             patch('plugins.S3AclPlugin.suspicious_bucket_grants', side_effect=ret_buckets):
+        with patch('plugins.s3acl.S3AclPlugin.traverse_bucket', return_value=[key1, key2]) as MockClass,\
+             patch('plugins.s3acl.S3AclPlugin.suspicious_object_grants', side_effect=ret_keys),\
+             patch('plugins.s3acl.S3AclPlugin.suspicious_bucket_grants', side_effect=ret_buckets):
 
             self.plugin.init(Mock(), {'user': 'bob', 'key': 'xxx'}, {})
             # run the tested method
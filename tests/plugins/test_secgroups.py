@@ -3,8 +3,8 @@ import socket
 import unittest
 
 from netaddr import IPNetwork
-from mock import patch, Mock, call
-from plugins import SecurityGroupPlugin
+from mock import patch, Mock, call, ANY
+from plugins.secgroups import SecurityGroupPlugin
 
 
 class PluginSecurityGroupTestCase(unittest.TestCase):
@@ -64,6 +64,26 @@ class PluginSecurityGroupTestCase(unittest.TestCase):
 
         self.assertFalse(result)
 
+    def test_is_whitelisted_perm_wildcards(self):
+        self.plugin.init(Mock(), self.config, {})
+        self.plugin.whitelisted_entries = {
+            'sg-1 (group1)': {'22': ["2.2.2.2/32"]},
+            '* (group?)': {'22': ["1.1.1.1/32"], '*': ["3.3.3.3/32"]},
+            'sg-9 (*)': {'22': ["0.0.0.0/0"]}
+        }
+
+        def whitelisted(ip_ranges, port=22, group=None):
+            perm = {"fromPort": port, "ipProtocol": "tcp", "ipRanges": ip_ranges, "toPort": port}
+            return self.plugin.is_whitelisted_perm(group or self.example_security_group, perm)
+
+        self.assertTrue(whitelisted(["2.2.2.2/32", "1.1.1.1/32"]))
+        self.assertTrue(whitelisted(["3.3.3.3/32"], port=8080))
+        self.assertFalse(whitelisted(["1.1.1.1/32"], port=8080))
+        self.assertFalse(whitelisted(["0.0.0.0/0"]))
+        self.assertTrue(whitelisted(["0.0.0.0/0"], group={'groupId': 'sg-9', 'groupName': 'other'}))
+        self.assertFalse(whitelisted(["2.2.2.2/32"], group={'groupId': 'sg-2', 'groupName': 'group2'}))
+        self.assertTrue(whitelisted(["1.1.1.1/32"], group={'groupId': 'sg-2', 'groupName': 'group2'}))
+
     def test_suspicious_perms(self):
         self.plugin.init(Mock(), self.config, {})
         self.plugin.whitelisted_entries = {'sg-2 (group2)': {'8000-9000': "2.2.2.2/32"}}
@@ -109,7 +129,7 @@ class PluginSecurityGroupTestCase(unittest.TestCase):
             instance.connect.side_effect = socket.error
             self.assertFalse(self.plugin.is_port_open('127.0.0.1', 22, 22))
 
-    @patch('plugins.SecurityGroupPlugin.is_port_open', return_value=True)
+    @patch('plugins.secgroups.SecurityGroupPlugin.is_port_open', return_value=True)
     def test_run(self, *mocks):
         eddaclient = Mock()
 
@@ -164,10 +184,10 @@ class PluginSecurityGroupTestCase(unittest.TestCase):
             ]
 
         m1 = Mock()
-        m1.query = Mock(side_effect=ret_list)
+        m1.iter_query = Mock(side_effect=ret_list)
         eddaclient.updateonly = Mock(return_value=m1)
 
-        eddaclient.query = Mock(side_effect=ret_machines)
+        eddaclient.iter_query = Mock(side_effect=ret_machines)
         self.plugin.init(eddaclient, self.config, {})
 
         # run the tested method
@@ -192,8 +212,49 @@ class PluginSecurityGroupTestCase(unittest.TestCase):
             }
         ])
 
-        m1.query.assert_has_calls([call('/api/v2/aws/securityGroups;_expand')])
-        eddaclient.query.assert_has_calls([call('/api/v2/view/instances;_expand')])
+        m1.iter_query.assert_has_calls([call('/api/v2/aws/securityGroups;_expand')])
+        eddaclient.iter_query.assert_has_calls([call('/api/v2/view/instances;_expand')])
+
+    def probe_machines(self, port_probe):
+        self.plugin.init(Mock(), dict(self.config, port_probe=port_probe), {})
+        self.plugin.is_port_open = Mock(side_effect=lambda host, port_from, port_to: host == '2.2.2.2')
+        machines = [{'instanceId': 'a', 'publicIpAddress': '1.1.1.1', 'tags': [],
+                     'securityGroups': [{"groupId": "sg-1"}], 'placement': {'availabilityZone': 'us-east-1a'}},
+                    {'instanceId': 'b', 'publicIpAddress': None, 'privateIpAddress': '2.2.2.2', 'tags': [],
+                     'securityGroups': [{"groupId": "sg-1"}], 'placement': {'availabilityZone': 'us-east-1a'}}]
+        group = {"groupId": "sg-1", "groupName": "group1", "ownerId": "111111"}
+        perms = [{"fromPort": 139, "ipProtocol": "tcp", "ipRanges": ["0.0.0.0/0"], "toPort": 140},
+                 {"fromPort": 1, "ipProtocol": "tcp", "ipRanges": ["0.0.0.0/0"], "toPort": 1000}]
+        machines_by_group = self.plugin.machines_by_group(machines)
+
+        open_ports = self.plugin.probe_ports([(group, perms)], machines_by_group)
+        return [detail['port_open'] for detail in self.plugin.create_details(perms, machines_by_group, group,
+                                                                              open_ports)]
+
+    def test_probed_until_open(self):
+        self.assertEqual(self.probe_machines({'threads': 1}), [True, None])
+        # the other port of the open machine is not probed
+        self.assertEqual([c[0] for c in self.plugin.is_port_open.call_args_list],
+                         [('1.1.1.1', 139, 139), ('2.2.2.2', 139, 139)])
+        self.assertEqual(self.plugin.status['port_probes'], {'1.1.1.1:139': [False, ANY], '2.2.2.2:139': [True, ANY]})
+
+    def test_probed_hosts_limit(self):
+        self.assertEqual(self.probe_machines({'max_hosts': 1}), [False, None])
+        self.assertItemsEqual([c[0] for c in self.plugin.is_port_open.call_args_list],
+                              [('1.1.1.1', 139, 139), ('1.1.1.1', 140, 140)])
+
+    def test_machines_by_group(self):
+        machines = [
+            {'instanceId': 'a', 'securityGroups': [{"groupId": "sg-1"}, {"groupId": "sg-2"}, {"groupId": "sg-1"}]},
+            {'instanceId': 'b', 'securityGroups': [{"groupId": "sg-2"}]},
+            {'instanceId': 'c', 'securityGroups': None},
+            {'instanceId': 'd'}
+        ]
+
+        index = self.plugin.machines_by_group(machines)
+
+        self.assertEqual({group_id: [m['instanceId'] for m in group] for group_id, group in index.iteritems()},
+                         {'sg-1': ['a'], 'sg-2': ['a', 'b']})
 
     def test_whitelist_ip_config(self):
         test_config = {"whitelisted_ips": ["^ just a comment", "192.168.0.1", "1.2.3.4/32", "8.8.8.8/24"]}
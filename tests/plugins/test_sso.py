@@ -3,7 +3,7 @@ import unittest
 
 from mock import Mock, call
 from httpretty import HTTPretty, httprettified
-from plugins import SSOUnprotected, SecurityHeaders
+from plugins.sso import SSOUnprotected, SecurityHeaders
 import plugins.sso
 
 
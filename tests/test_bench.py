@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+import unittest
+
+from bench.fleet import Fleet
+from bench.suite import benchmarked_plugins, measure, regressions
+
+
+class BenchTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.fleet = Fleet(100)
+
+    def test_fleet(self):
+        self.assertEqual(len(self.fleet.instances), 100)
+        self.assertEqual(len(self.fleet.security_groups), 10)
+        self.assertEqual(Fleet(100).instances, self.fleet.instances)
+
+    def test_measure(self):
+        self.assertNotIn('s3acl', benchmarked_plugins())
+        for name in benchmarked_plugins():
+            metrics = measure(self.fleet, name)
+            self.assertGreaterEqual(metrics['wall_seconds'], 0)
+            self.assertGreater(metrics['queries'], 0)
+
+    def test_regressions(self):
+        baseline = {'1000': {'elbs': {'wall_seconds': 1.0, 'peak_memory_delta_bytes': 0}, 'ami': {'timed_out': 1}}}
+        results = {'1000': {'elbs': {'wall_seconds': 1.2, 'peak_memory_delta_bytes': 0}, 'ami': {'timed_out': 1}}}
+        self.assertEqual(list(regressions(results, baseline, 0.25)), [])
+
+        results['1000']['elbs']['wall_seconds'] = 1.3
+        self.assertEqual(list(regressions(results, baseline, 0.25)), [('1000', 'elbs', 'wall_seconds 1.00 -> 1.30')])
+
+        results['1000']['elbs'] = {'timed_out': 1}
+        self.assertEqual(list(regressions(results, baseline, 0.25)), [('1000', 'elbs', 'did not finish')])
+
+
+def main():
+    unittest.main()
+
+if __name__ == '__main__':
+    main()
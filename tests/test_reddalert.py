@@ -1,5 +1,7 @@
 #!/usr/bin/env python
 import os
+import shutil
+import tempfile
 import unittest
 
 from mock import Mock, call
@@ -55,6 +57,21 @@ class ReddalertTestCase(unittest.TestCase):
             call.exception("Failed to write file '%s'", '/tmp' * 100)
         ])
 
+    def test_sqlite_status(self):
+        directory = tempfile.mkdtemp()
+        try:
+            status_file = os.path.join(directory, 'statusfile.db')
+            status = self.reddalert.load_status(status_file, Mock())
+            status['plugin.ami'] = {'first_seen': {'ami-111': 1392100947000}}
+
+            self.assertTrue(self.reddalert.save_status(status_file, status, Mock()))
+            status.close()
+            status = self.reddalert.load_status(status_file, Mock())
+            self.assertEqual(dict(status['plugin.ami']), {'first_seen': {'ami-111': 1392100947000}})
+            status.close()
+        finally:
+            shutil.rmtree(directory)
+
     def test_get_config(self):
         config = {'b': 1}
         self.assertEqual(self.reddalert.get_config('b', config), 1)